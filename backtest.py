@@ -0,0 +1,149 @@
+"""Offline replay of recorded market activity under alternative policies.
+
+    python backtest.py snapshot.json [--trades later_snapshot.json|trades.ndjson]
+                       [--scenarios scenarios.json] [--runs 200] [--days 28] [--workers N]
+
+snapshot.json is a market data file (a local shard file or a Discord backup attachment) taken at the
+start of the period. Trades come from --trades (another market data file's "trade_history", or an
+NDJSON file of the same events). Without --trades the snapshot's own history is used, starting
+after its last recorded event, so only a later file adds anything to replay.
+
+scenarios.json is a list of {"name": ..., <policy overrides>}; the default policy mirrors bot.py.
+Never imports bot.py: everything runs on market_jobs, fanned out over a process pool.
+"""
+import argparse
+import copy
+import datetime
+import json
+import os
+import statistics
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+
+import market_jobs
+
+# Mirrors the constants and cadences in bot.py.
+DEFAULT_POLICY: dict[str, Any] = {
+    "volatility_levels": [0.10, 0.20, 0.30, 0.40, 0.50, 0.60, 0.70, 0.80, 0.90, 1.00, 1.20, 1.50],
+    "min_price": 50.00,
+    "max_price": 230.00,
+    "price_interval_hours": 72,
+    "conversion_interval_hours": 168,
+    "cooldown_after_conversion": True,
+    "conversion_coin": "Campton Coin",
+}
+INITIAL_PRICE = 120.00
+CRYPTO_NAMES = ["Campton Coin"]
+
+def fill_defaults(data: dict[str, Any]) -> dict[str, Any]:
+    """Fill in the sections bot.py's loader would add to an empty or partial market data file."""
+    if not data.get("coins"):
+        data["coins"] = {name: {"price": INITIAL_PRICE} for name in CRYPTO_NAMES}
+    data.setdefault("users", {})
+    data.setdefault("trade_history", [])
+    return data
+
+def parse_ts(value: str) -> float:
+    dt = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=datetime.timezone.utc)
+    return dt.timestamp()
+
+def load_trades(path: str) -> list[dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".ndjson"):
+            events = [json.loads(line) for line in f if line.strip()]
+        else:
+            events = json.load(f).get("trade_history", [])
+    for event in events:
+        event["ts"] = parse_ts(event["t"])
+    return events
+
+_worker_data: dict[str, Any] = {}
+_worker_trades: list[dict[str, Any]] = []
+
+def init_worker(data: dict[str, Any], trades: list[dict[str, Any]]):
+    """Ship the snapshot and trades to each worker once instead of with every scenario."""
+    global _worker_data, _worker_trades
+    _worker_data, _worker_trades = data, trades
+
+def run_scenario(args: tuple[float, float, dict[str, Any], int]) -> tuple[str, dict[str, Any]]:
+    start, end, policy, seed = args
+    return policy["name"], market_jobs.replay_market(copy.deepcopy(_worker_data), _worker_trades, start, end, policy, seed)
+
+def summarize(results: list[dict[str, Any]]) -> dict[str, Any]:
+    finals = sorted(r["final_price"] for r in results)
+    payouts = sorted(sum(r["conversion_payouts"]) for r in results)
+
+    def mean_of(key: str) -> float:
+        return round(statistics.fmean(r["wealth"][key] for r in results), 4)
+
+    return {
+        "runs": len(results),
+        "final_price": {q: market_jobs.percentile(finals, p) for q, p in (("p05", 0.05), ("p50", 0.5), ("p95", 0.95))},
+        "total_conversion_payout": {q: round(market_jobs.percentile(payouts, p), 2) for q, p in (("p05", 0.05), ("p50", 0.5), ("p95", 0.95))},
+        "conversions_per_run": len(results[0]["conversion_payouts"]) if results else 0,
+        "net_worth_p50": mean_of("p50"),
+        "net_worth_p90": mean_of("p90"),
+        "gini": mean_of("gini"),
+        "top10_share": mean_of("top10_share"),
+        "trades_skipped": round(statistics.fmean(r["trades_skipped"] for r in results), 1),
+        "sample_price_path": results[0]["price_path"] if results else [],
+    }
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Replay recorded market activity under alternative policies.")
+    parser.add_argument("snapshot", help="Market data JSON at the start of the replay.")
+    parser.add_argument("--trades", help="Market data JSON or .ndjson with the events to replay.")
+    parser.add_argument("--scenarios", help="JSON list of policy overrides, each with a 'name'.")
+    parser.add_argument("--runs", type=int, default=200, help="Random seeds per scenario.")
+    parser.add_argument("--days", type=float, help="Length of the replay (default: until the last trade, at least 28 days).")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--output", help="Write the report here instead of stdout.")
+    args = parser.parse_args(argv)
+
+    with open(args.snapshot, encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        parser.error(f"{args.snapshot} is not a market data file (expected a JSON object).")
+    fill_defaults(data)
+    # The snapshot already contains its own recorded events; replay only what came after them.
+    own_history = [parse_ts(e["t"]) for e in data.get("trade_history", [])]
+    trades = load_trades(args.trades or args.snapshot)
+    if own_history:
+        start = max(own_history)
+        trades = [t for t in trades if t["ts"] > start]
+    else:
+        start = min((t["ts"] for t in trades), default=datetime.datetime.now(datetime.timezone.utc).timestamp())
+    end = start + args.days * 86400 if args.days else max([t["ts"] for t in trades] + [start + 28 * 86400])
+
+    scenarios = [{"name": "baseline"}]
+    if args.scenarios:
+        with open(args.scenarios, encoding="utf-8") as f:
+            scenarios += json.load(f)
+    policies = [{**DEFAULT_POLICY, **scenario} for scenario in scenarios]
+
+    work = [(start, end, policy, seed) for policy in policies for seed in range(args.runs)]
+    results: dict[str, list[dict[str, Any]]] = {policy["name"]: [] for policy in policies}
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker, initargs=(data, trades)) as pool:
+        for name, result in pool.map(run_scenario, work, chunksize=max(1, len(work) // (args.workers * 4))):
+            results[name].append(result)
+
+    report = {
+        "start": datetime.datetime.fromtimestamp(start, datetime.timezone.utc).isoformat(),
+        "end": datetime.datetime.fromtimestamp(end, datetime.timezone.utc).isoformat(),
+        "trades": len(trades),
+        "initial_wealth": market_jobs.wealth_summary(data),
+        "scenarios": {name: summarize(runs) for name, runs in results.items()},
+    }
+    text = json.dumps(report, indent=4)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
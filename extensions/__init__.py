@@ -0,0 +1,2 @@
+# Slash command modules, loaded as discord.py extensions by bot.py and reloadable with /reload.
+# Each one imports what it needs from the running bot module and registers its commands in setup().
@@ -0,0 +1,738 @@
+"""Owner market administration: price and ledger adjustments, bulk edits, withdrawals and server settings."""
+import csv
+import datetime
+import discord
+import io
+import math
+import re
+from collections import Counter
+from decimal import Decimal
+from discord import app_commands, ui
+from discord.ext import commands
+from typing import Any
+
+from bot import (
+    CAMPTOM_COIN_NAME, D, get_user, interaction_shard, is_co_owner, is_owner_only, iter_holder_members, log,
+    market_scheduler, MarketShard, MAX_PRICE, MEMBER_CACHE_MODE, MIN_PRICE, _perform_crypto_to_cash_conversion,
+    record_trade, register_commands, resolve_user, save_data, send_log_dm, spawn,
+    too_many_decimals, update_prices, VerifyView, work_scheduler,
+)
+
+# ────────────────────────── Commands (patched permissions) ───────────────────
+@app_commands.command(name='prices', description='Displays the current price of Campton Coin.')
+@app_commands.default_permissions(administrator=True)
+@app_commands.check(is_owner_only)
+@app_commands.guild_only()
+async def prices(interaction: discord.Interaction):
+    await interaction.response.defer()
+    shard = interaction_shard(interaction)
+    update_prices(shard) 
+    await save_data(shard)
+    embed = discord.Embed(title="Current Crypto Market Prices", color=discord.Color.green())
+    for coin_name, data in shard.data["coins"].items():
+        embed.add_field(name=coin_name, value=f"{data['price']:.2f} dollars", inline=True)
+    await interaction.followup.send(embed=embed)
+
+@prices.error
+async def prices_error(interaction: discord.Interaction, error: app_commands.AppCommandError):
+    if isinstance(error, app_commands.CheckFailure):
+        await interaction.response.send_message("You must be the bot owner to use this command.", ephemeral=True)
+    else:
+        if interaction.response.is_done():
+            await interaction.followup.send(f"An unexpected error occurred: {error}", ephemeral=True)
+        else:
+            await interaction.response.send_message(f"An unexpected error occurred: {error}", ephemeral=True)
+        
+@app_commands.command(
+    name='addfunds',
+    description='Adds funds to a specified user\'s balance. (Owner/Co-Owner)'
+)
+@app_commands.default_permissions(administrator=True)
+@app_commands.describe(
+    member='The user to add funds to.',
+    amount='The amount of funds to add.'
+)
+@app_commands.check(is_co_owner)
+@app_commands.guild_only()
+async def add_funds(
+    interaction: discord.Interaction,
+    member: discord.Member,
+    amount: float
+):
+    await interaction.response.defer(ephemeral=True)
+    shard = interaction_shard(interaction)
+
+    if amount <= 0:
+        return await interaction.followup.send(
+            "Amount must be greater than 0.",
+            ephemeral=True
+        )
+
+    user_data = get_user(shard, member.id)
+    user_data["balance"] = float(
+        D(str(user_data["balance"])) + Decimal(str(amount))
+    )
+    shard.touch_users(member.id)
+    record_trade(shard, "adjust", member.id, cash=amount)
+    await save_data(shard)
+
+    await interaction.followup.send(
+        f"Successfully added {amount:.2f} dollars to {member.display_name}'s balance. "
+        f"Their new balance is {user_data['balance']:.2f} dollars.",
+        ephemeral=True
+    )
+
+@app_commands.command(
+    name="removefunds",
+    description="(Owner/Co-Owner) Remove funds from a user"
+)
+@app_commands.check(is_co_owner)
+@app_commands.default_permissions(administrator=True)
+@app_commands.describe(
+    member="The user to remove funds from",
+    amount="Amount of funds to remove"
+)
+@app_commands.guild_only()
+async def removefunds(
+    interaction: discord.Interaction,
+    member: discord.Member,
+    amount: float
+):
+    await interaction.response.defer(ephemeral=True)
+    shard = interaction_shard(interaction)
+
+    if amount <= 0:
+        return await interaction.followup.send(
+            "Amount must be greater than 0.",
+            ephemeral=True
+        )
+
+    user_data = get_user(shard, member.id)
+
+    if user_data["balance"] < amount:
+        return await interaction.followup.send(
+            f"{member.display_name} does not have enough funds.",
+            ephemeral=True
+        )
+
+    user_data["balance"] -= amount
+    shard.touch_users(member.id)
+    record_trade(shard, "adjust", member.id, cash=-amount)
+    await save_data(shard)
+
+    await interaction.followup.send(
+        f"Removed **${amount:.2f}** from {member.display_name}.",
+        ephemeral=True
+    )
+
+@app_commands.command(name='addcoins', description='(Owner) Add Campton Coin to a member\'s portfolio.')
+@app_commands.default_permissions(manage_guild=False)
+@app_commands.describe(member='The user to add coins to.', quantity='The number of coins to add.')
+@app_commands.check(is_co_owner)
+@app_commands.guild_only()
+async def addcoins(interaction: discord.Interaction, member: discord.Member, quantity: float):
+    await interaction.response.defer(ephemeral=True)
+    shard = interaction_shard(interaction)
+
+    if quantity <= 0:
+        await interaction.followup.send("Quantity must be greater than 0.", ephemeral=True)
+        return
+
+    if too_many_decimals(Decimal(str(quantity)), 3):
+        await interaction.followup.send("You can only add coins with up to 3 decimal places (e.g., 0.123).", ephemeral=True)
+        return
+
+    user_data = get_user(shard, member.id) 
+    user_data["portfolio"][CAMPTOM_COIN_NAME] = float(D(str(user_data["portfolio"].get(CAMPTOM_COIN_NAME, 0.0))) + Decimal(str(quantity))) 
+    shard.touch_users(member.id)
+    record_trade(shard, "adjust", member.id, CAMPTOM_COIN_NAME, quantity)
+    await save_data(shard)
+
+    await interaction.followup.send(f"Successfully added {quantity:.3f} {CAMPTOM_COIN_NAME} to {member.display_name}'s portfolio. They now have {user_data['portfolio'][CAMPTOM_COIN_NAME]:.3f} coins.", ephemeral=True)
+@app_commands.command(
+    name="removecoins",
+    description="(Owner/Co-Owner) Remove coins from a user"
+)
+@app_commands.check(is_co_owner)
+@app_commands.default_permissions(administrator=True)
+@app_commands.describe(
+    member="The user to remove coins from",
+    amount="Amount of coins to remove"
+)
+@app_commands.guild_only()
+async def removecoins(
+    interaction: discord.Interaction,
+    member: discord.Member,
+    amount: float
+):
+    await interaction.response.defer(ephemeral=True)
+    shard = interaction_shard(interaction)
+
+    if amount <= 0:
+        return await interaction.followup.send(
+            "Amount must be greater than 0.",
+            ephemeral=True
+        )
+
+    if too_many_decimals(Decimal(str(amount)), 3):
+        return await interaction.followup.send(
+            "Coins can only have up to 3 decimal places.",
+            ephemeral=True
+        )
+
+    user_data = get_user(shard, member.id)
+
+    current = Decimal(str(
+        user_data["portfolio"].get(CAMPTOM_COIN_NAME, 0.0)
+    ))
+
+    if current < Decimal(str(amount)):
+        return await interaction.followup.send(
+            f"{member.display_name} does not have enough coins.",
+            ephemeral=True
+        )
+
+    user_data["portfolio"][CAMPTOM_COIN_NAME] = float(
+        current - Decimal(str(amount))
+    )
+    shard.touch_users(member.id)
+    record_trade(shard, "adjust", member.id, CAMPTOM_COIN_NAME, -amount)
+
+    await save_data(shard)
+
+    await interaction.followup.send(
+        f"Removed **{amount:.3f} {CAMPTOM_COIN_NAME}** from {member.display_name}.",
+        ephemeral=True
+    )
+
+# ────────────────────────── bulk admin adjustments ─────────────────
+BULK_ACTIONS = {
+    "add_funds": ("balance", 2, 1),
+    "remove_funds": ("balance", 2, -1),
+    "add_coins": ("portfolio", 3, 1),
+    "remove_coins": ("portfolio", 3, -1),
+}
+MAX_BULK_CSV_BYTES = 1024 * 1024
+MEMBER_TOKEN = re.compile(r"<@!?(\d{15,21})>|(\d{15,21})")  # a user mention or a bare user ID, nothing else
+
+def parse_member_ids(text: str) -> tuple[list[int], list[str]]:
+    """Mentions or user IDs separated by spaces or commas. Role/channel mentions and other tokens are errors."""
+    ids, errors = [], []
+    for token in re.split(r"[\s,]+", text.strip()):
+        if not token:
+            continue
+        match = MEMBER_TOKEN.fullmatch(token)
+        if match is None:
+            errors.append(f"'{token}' is not a member mention or user ID.")
+            continue
+        ids.append(int(match.group(1) or match.group(2)))
+    return ids, errors
+
+async def parse_bulk_csv(attachment: discord.Attachment) -> tuple[list[tuple[int, str | None]], list[str]]:
+    """Rows are `user_id[,amount]`; a header row and blank lines are ignored."""
+    if attachment.size > MAX_BULK_CSV_BYTES:
+        return [], [f"CSV is larger than {MAX_BULK_CSV_BYTES // 1024} KB."]
+    text = (await attachment.read()).decode("utf-8-sig", errors="replace")
+    entries, errors = [], []
+    for line_no, row in enumerate(csv.reader(io.StringIO(text)), 1):
+        if not row or not row[0].strip():
+            continue
+        match = MEMBER_TOKEN.fullmatch(row[0].strip())
+        if match is None:
+            if line_no != 1:
+                errors.append(f"Line {line_no}: '{row[0]}' is not a user ID.")
+            continue
+        amount = row[1].strip() if len(row) > 1 and row[1].strip() else None
+        entries.append((int(match.group(1) or match.group(2)), amount))
+    return entries, errors
+
+async def role_member_ids(guild: discord.Guild, role: discord.Role) -> list[int]:
+    if MEMBER_CACHE_MODE == "full":
+        return [m.id for m in role.members if not m.bot]
+    # Without a full member cache role.members is incomplete; page through the member list instead.
+    return [m.id async for m in guild.fetch_members(limit=None) if not m.bot and role in m.roles]
+
+async def non_member_ids(guild: discord.Guild, user_ids: list[int]) -> list[int]:
+    """The ids in user_ids that aren't (non-bot) members of the guild, so they never become ledger users."""
+    found: set[int] = set()
+    async for members in iter_holder_members(guild, user_ids):
+        found.update(m.id for m in members)
+    return [uid for uid in user_ids if uid not in found]
+
+def plan_bulk_adjustment(shard: MarketShard, action: str, entries: list[tuple[int, str | None]], default_amount: float | None) -> tuple[dict[int, Decimal], list[str]]:
+    """Validate every entry against the current ledger. Nothing is applied here.
+
+    Entries for the same user add up, so callers pass each role/member-list target once; only
+    repeated CSV rows are meant to be summed.
+    """
+    field, places, sign = BULK_ACTIONS[action]
+    changes: dict[int, Decimal] = {}
+    errors: list[str] = []
+    for uid, raw_amount in entries:
+        raw = raw_amount if raw_amount is not None else default_amount
+        if raw is None:
+            errors.append(f"{uid}: no amount given.")
+            continue
+        try:
+            amount = Decimal(str(raw))
+        except ArithmeticError:
+            errors.append(f"{uid}: '{raw}' is not a number.")
+            continue
+        if not amount.is_finite():  # NaN can't be compared and Infinity would be written to the ledger
+            errors.append(f"{uid}: '{raw}' is not a number.")
+            continue
+        if amount <= 0 or too_many_decimals(amount, places):
+            errors.append(f"{uid}: amount must be positive with at most {places} decimal places.")
+            continue
+        changes[uid] = changes.get(uid, Decimal("0")) + amount
+
+    if sign < 0:
+        for uid, amount in changes.items():
+            user = shard.data["users"].get(str(uid), {})
+            held = user.get("balance", 0.0) if field == "balance" else user.get("portfolio", {}).get(CAMPTOM_COIN_NAME, 0.0)
+            if Decimal(str(held)) < amount:
+                errors.append(f"{uid}: only has {held:.{places}f}, cannot remove {amount}.")
+    return changes, errors
+
+def apply_bulk_adjustment(shard: MarketShard, action: str, changes: dict[int, Decimal]):
+    field, _, sign = BULK_ACTIONS[action]
+    for uid, amount in changes.items():
+        user_data = get_user(shard, uid)
+        if field == "balance":
+            user_data["balance"] = float(Decimal(str(user_data["balance"])) + sign * amount)
+        else:
+            held = Decimal(str(user_data["portfolio"].get(CAMPTOM_COIN_NAME, 0.0))) + sign * amount
+            if held <= Decimal("0.0001"):
+                user_data["portfolio"].pop(CAMPTOM_COIN_NAME, None)
+            else:
+                user_data["portfolio"][CAMPTOM_COIN_NAME] = float(held)
+    shard.touch_users(*changes)
+    for uid, amount in changes.items():
+        if field == "balance":
+            record_trade(shard, "adjust", uid, cash=float(sign * amount))
+        else:
+            record_trade(shard, "adjust", uid, CAMPTOM_COIN_NAME, float(sign * amount))
+
+@app_commands.command(name='bulkadjust', description='(Owner/Co-Owner) Add or remove funds/coins for many members in one transaction.')
+@app_commands.default_permissions(administrator=True)
+@app_commands.describe(
+    action='What to change.',
+    amount='Amount per member. Optional for CSV rows that carry their own amount.',
+    role='Apply to every member with this role.',
+    members='Mentions or user IDs separated by spaces or commas.',
+    csv_file='CSV with rows of user_id[,amount]. Several rows for one user add up.'
+)
+@app_commands.choices(action=[
+    app_commands.Choice(name='Add Funds', value='add_funds'),
+    app_commands.Choice(name='Remove Funds', value='remove_funds'),
+    app_commands.Choice(name='Add Coins', value='add_coins'),
+    app_commands.Choice(name='Remove Coins', value='remove_coins'),
+])
+@app_commands.check(is_co_owner)
+@app_commands.guild_only()
+async def bulk_adjust(
+    interaction: discord.Interaction,
+    action: app_commands.Choice[str],
+    amount: float = None,
+    role: discord.Role = None,
+    members: str = None,
+    csv_file: discord.Attachment = None
+):
+    await interaction.response.defer(ephemeral=True)
+    shard = interaction_shard(interaction)
+
+    errors: list[str] = []
+    # Role members and listed members are targets: each gets the amount once, however often they appear.
+    targets: dict[int, None] = {}
+    repeated: set[int] = set()
+    listed: list[int] = []
+    if members:
+        listed, member_errors = parse_member_ids(members)
+        errors += member_errors
+    for uid in (await role_member_ids(interaction.guild, role) if role else []) + listed:
+        if uid in targets:
+            repeated.add(uid)
+        targets[uid] = None
+    csv_entries: list[tuple[int, str | None]] = []
+    if csv_file:
+        csv_entries, csv_errors = await parse_bulk_csv(csv_file)
+        errors += csv_errors
+    csv_rows = Counter(uid for uid, _ in csv_entries)
+    errors += [f"{uid}: listed in the CSV and in the role/member list; use one or the other." for uid in csv_rows if uid in targets]
+    summed = [uid for uid, count in csv_rows.items() if count > 1]
+    entries: list[tuple[int, str | None]] = [(uid, None) for uid in targets] + csv_entries
+
+    errors += [f"{uid}: not a member of this server." for uid in await non_member_ids(interaction.guild, list(dict.fromkeys(listed + list(csv_rows))))]
+
+    if not entries and not errors:
+        await interaction.followup.send("Give a role, a member list or a CSV file.", ephemeral=True)
+        return
+
+    changes, plan_errors = plan_bulk_adjustment(shard, action.value, entries, amount)
+    errors += plan_errors
+    if errors:
+        shown = "\n".join(errors[:15])
+        more = f"\n…and {len(errors) - 15} more." if len(errors) > 15 else ""
+        await interaction.followup.send(f"❌ Nothing was changed. Fix these entries and try again:\n{shown}{more}", ephemeral=True)
+        return
+
+    apply_bulk_adjustment(shard, action.value, changes)
+    await save_data(shard)
+
+    total = sum(changes.values(), Decimal("0"))
+    unit = "dollars" if BULK_ACTIONS[action.value][0] == "balance" else CAMPTOM_COIN_NAME
+    payload = {
+        "timestamp": datetime.datetime.utcnow().isoformat() + "Z",
+        "guild_id": shard.guild_id,
+        "action": action.value,
+        "members": len(changes),
+        "total": str(total),
+        "changes": {str(uid): str(amt) for uid, amt in changes.items()},
+        "user": {"id": interaction.user.id, "username": str(interaction.user)},
+    }
+    await work_scheduler.run("background", send_log_dm, payload, "bulk_adjust.json", "Bulk Adjustment")
+
+    notes = ""
+    if repeated:
+        notes += f"\n{len(repeated)} member(s) were listed more than once and counted once."
+    if summed:
+        notes += f"\n{len(summed)} member(s) had several CSV rows; their amounts were added up."
+    await interaction.followup.send(f"✅ {action.name}: {total} {unit} across {len(changes)} members.{notes}", ephemeral=True)
+    log.info(f"CMD_BULK: {action.value} of {total} {unit} across {len(changes)} members in guild {shard.guild_id} by {interaction.user.display_name}.")
+
+# ────────────────────────── withdrawals ────────────────────────────
+WITHDRAWALS_PER_PAGE = 10
+WITHDRAWAL_REVIEW_TIMEOUT = 900  # seconds
+
+async def notify_withdrawal_results(shard: MarketShard, settled: list[dict[str, Any]], approved: bool):
+    """One DM per user after a batch is settled, off the review path. Cached members/users first."""
+    by_user: dict[int, list[dict[str, Any]]] = {}
+    for request in settled:
+        by_user.setdefault(int(request["user"]), []).append(request)
+    guild = shard.guild
+    for index, (uid, requests) in enumerate(by_user.items()):
+        await work_scheduler.checkpoint(index)
+        amounts = ", ".join(f"#{r['id']} ({r['amount']:.2f} dollars)" for r in requests)
+        embed = discord.Embed(
+            title="✅ Withdrawal Approved! ✅" if approved else "⛔ Withdrawal Denied ⛔",
+            description=f"Your withdrawal request {amounts} has been approved by the bot owner." if approved
+                        else f"Your withdrawal request {amounts} was denied. The held amount is back in your balance.",
+            color=discord.Color.green() if approved else discord.Color.red()
+        )
+        try:
+            target = (guild.get_member(uid) if guild else None) or await resolve_user(uid)
+            await target.send(embed=embed)
+        except (discord.Forbidden, discord.NotFound):
+            log.warning(f"WARNING: Could not send DM to user {uid} about settled withdrawals. DMs might be disabled.")
+
+async def finish_settlement(interaction: discord.Interaction, shard: MarketShard, settled: list[dict[str, Any]], approved: bool):
+    """The batch is already applied in memory; commit it once and notify the users in the background."""
+    await save_data(shard)
+    total = sum(r["amount"] for r in settled)
+    log.info(f"CMD_WITHDRAWALS: {'Approved' if approved else 'Denied'} {len(settled)} withdrawal(s) totalling {total:.2f} dollars "
+             f"in guild {shard.guild_id} by {interaction.user.display_name}.")
+    spawn(notify_withdrawal_results(shard, settled, approved), "withdrawal_results")
+
+class WithdrawalReviewView(ui.View):
+    """Pages through the pending queue; approve or deny the selected requests (or the whole page) at once."""
+
+    def __init__(self, shard: MarketShard):
+        super().__init__(timeout=WITHDRAWAL_REVIEW_TIMEOUT)
+        self.shard = shard
+        self.page = 0
+        self.selected: list[int] = []
+        self.refresh()
+
+    def page_requests(self) -> tuple[list[dict[str, Any]], int]:
+        pending = self.shard.withdrawals.pending()
+        pages = max(1, math.ceil(len(pending) / WITHDRAWALS_PER_PAGE))
+        self.page = min(self.page, pages - 1)
+        return pending[self.page * WITHDRAWALS_PER_PAGE:(self.page + 1) * WITHDRAWALS_PER_PAGE], pages
+
+    def embed(self) -> discord.Embed:
+        pending = self.shard.withdrawals.pending()
+        requests, pages = self.page_requests()
+        embed = discord.Embed(
+            title="Pending Withdrawals",
+            description="\n".join(
+                f"**#{r['id']}** · <@{r['user']}> ({r['name']}) · **{r['amount']:.2f} dollars** · <t:{int(datetime.datetime.fromisoformat(r['requested_at']).timestamp())}:R>"
+                for r in requests
+            ) or "The queue is empty.",
+            color=discord.Color.orange()
+        )
+        embed.set_footer(text=f"Page {self.page + 1}/{pages} · {len(pending)} pending · {sum(r['amount'] for r in pending):.2f} dollars on hold")
+        return embed
+
+    def refresh(self):
+        requests, pages = self.page_requests()
+        self.selected = [rid for rid in self.selected if any(r["id"] == rid for r in requests)]
+        self.pick.options = [
+            discord.SelectOption(label=f"#{r['id']} · {r['amount']:.2f} · {r['name']}"[:100], value=str(r["id"]), default=r["id"] in self.selected)
+            for r in requests
+        ] or [discord.SelectOption(label="No pending requests", value="0")]
+        self.pick.max_values = len(self.pick.options)
+        self.pick.disabled = not requests
+        self.previous_page.disabled = self.page == 0
+        self.next_page.disabled = self.page >= pages - 1
+        self.approve.disabled = self.deny.disabled = not self.selected
+        self.approve_page.disabled = not requests
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if not is_co_owner(interaction):
+            await interaction.response.send_message("Only the bot owners can review withdrawals.", ephemeral=True)
+            return False
+        return True
+
+    async def show(self, interaction: discord.Interaction):
+        self.refresh()
+        await interaction.response.edit_message(embed=self.embed(), view=self)
+
+    async def settle(self, interaction: discord.Interaction, request_ids: list[int], approved: bool):
+        settled = self.shard.withdrawals.settle(request_ids, approved, interaction.user.id)
+        self.selected = []
+        await self.show(interaction)
+        skipped = len(request_ids) - len(settled)
+        note = f" {skipped} were already settled by someone else." if skipped else ""
+        await interaction.followup.send(
+            f"{'✅ Approved' if approved else '⛔ Denied'} {len(settled)} request(s) totalling {sum(r['amount'] for r in settled):.2f} dollars.{note}",
+            ephemeral=True
+        )
+        if settled:
+            await finish_settlement(interaction, self.shard, settled, approved)
+
+    @ui.select(placeholder="Select requests to settle...", min_values=0, row=0)
+    async def pick(self, interaction: discord.Interaction, select: ui.Select):
+        self.selected = [int(v) for v in select.values]
+        await self.show(interaction)
+
+    @ui.button(label="◀ Previous", style=discord.ButtonStyle.secondary, row=1)
+    async def previous_page(self, interaction: discord.Interaction, button: ui.Button):
+        self.page -= 1
+        self.selected = []
+        await self.show(interaction)
+
+    @ui.button(label="Next ▶", style=discord.ButtonStyle.secondary, row=1)
+    async def next_page(self, interaction: discord.Interaction, button: ui.Button):
+        self.page += 1
+        self.selected = []
+        await self.show(interaction)
+
+    @ui.button(label="Approve Selected", style=discord.ButtonStyle.success, row=2)
+    async def approve(self, interaction: discord.Interaction, button: ui.Button):
+        await self.settle(interaction, list(self.selected), True)
+
+    @ui.button(label="Deny Selected", style=discord.ButtonStyle.danger, row=2)
+    async def deny(self, interaction: discord.Interaction, button: ui.Button):
+        await self.settle(interaction, list(self.selected), False)
+
+    @ui.button(label="Approve Page", style=discord.ButtonStyle.success, row=2)
+    async def approve_page(self, interaction: discord.Interaction, button: ui.Button):
+        requests, _ = self.page_requests()
+        await self.settle(interaction, [r["id"] for r in requests], True)
+
+@app_commands.command(name='withdrawals', description='(Owner) Review pending withdrawal requests and approve or deny them in bulk.')
+@app_commands.default_permissions(manage_guild=False)
+@app_commands.check(is_co_owner)
+@app_commands.guild_only()
+async def withdrawals(interaction: discord.Interaction):
+    view = WithdrawalReviewView(interaction_shard(interaction))
+    await interaction.response.send_message(embed=view.embed(), view=view, ephemeral=True)
+
+def queue_legacy_withdrawal(shard: MarketShard, guild: discord.Guild, user_id: str, amount: float) -> tuple[dict[str, Any] | None, str | None]:
+    """Queue a withdrawal that was requested before the queue existed (DM only, nothing held), so it
+    can be settled like any other. Returns (request, None) or (None, reason)."""
+    try:
+        uid = int(user_id)
+    except ValueError:
+        return None, "Invalid user ID provided. Please provide a numerical user ID."
+    if amount <= 0 or too_many_decimals(Decimal(str(amount)), 2):
+        return None, "Amount must be positive with at most 2 decimal places."
+    user_data = shard.data["users"].get(str(uid))
+    if user_data is None or user_data["balance"] < amount:
+        balance = user_data["balance"] if user_data else 0.0
+        return None, f"User `{uid}` only has {balance:.2f} dollars, which is less than the requested {amount:.2f} dollars. Cannot approve."
+    member = guild.get_member(uid)
+    return shard.withdrawals.submit(uid, member.display_name if member else str(uid), Decimal(str(amount))), None
+
+@app_commands.command(name='approvewithdrawal', description='(Owner) Approves or denies a single withdrawal request by its number.')
+@app_commands.default_permissions(manage_guild=False)
+@app_commands.describe(
+    request_id='The request number from /withdrawals or the owner DM.',
+    deny='Deny the request and return the held amount instead.',
+    user_id='Only for requests made before the queue existed: the requester\'s user ID.',
+    amount='Only for requests made before the queue existed: the amount to pay out.'
+)
+@app_commands.check(is_co_owner)
+@app_commands.guild_only()
+async def approve_withdrawal(interaction: discord.Interaction, request_id: int = None, deny: bool = False,
+                             user_id: str = None, amount: float = None):
+    shard = interaction_shard(interaction)
+    if request_id is None:
+        if user_id is None or amount is None:
+            await interaction.response.send_message("Give a request number, or a user ID and amount for a request made before the queue existed.", ephemeral=True)
+            return
+        if deny:
+            await interaction.response.send_message("Requests made before the queue existed held no funds; there is nothing to deny.", ephemeral=True)
+            return
+        request, error = queue_legacy_withdrawal(shard, interaction.guild, user_id, amount)
+        if request is None:
+            await interaction.response.send_message(error, ephemeral=True)
+            return
+        request_id = request["id"]
+
+    request = shard.withdrawals.get(request_id)
+    if request is None:
+        await interaction.response.send_message(f"No withdrawal request #{request_id} found in this server.", ephemeral=True)
+        return
+    if request["status"] != "pending":
+        await interaction.response.send_message(f"Request #{request_id} was already {request['status']}.", ephemeral=True)
+        return
+
+    settled = shard.withdrawals.settle([request_id], not deny, interaction.user.id)
+    user_data = get_user(shard, int(request["user"]))
+    await interaction.response.send_message(
+        f"{'⛔ Denied' if deny else '✅ Approved'} withdrawal #{request_id} of {request['amount']:.2f} dollars for <@{request['user']}>. "
+        f"Their balance is {user_data['balance']:.2f} dollars.",
+        ephemeral=True
+    )
+    await finish_settlement(interaction, shard, settled, not deny)
+
+# ────────────────────────── members & verification ─────────────────
+@app_commands.command(name='lookup', description='(Owner Only) Finds who verified as a Roblox username or Project New Campton name.')
+@app_commands.default_permissions(manage_guild=False)
+@app_commands.describe(roblox_username='Roblox username to look up.', pnc_name='Project New Campton full name to look up.')
+@app_commands.check(is_co_owner)
+@app_commands.guild_only()
+async def lookup(interaction: discord.Interaction, roblox_username: str = None, pnc_name: str = None):
+    if not roblox_username and not pnc_name:
+        await interaction.response.send_message("Give a Roblox username or a Project New Campton name to look up.", ephemeral=True)
+        return
+    shard = interaction_shard(interaction)
+    index = shard.verifications
+    uid = index.owner_of_roblox(roblox_username) if roblox_username else index.owner_of_name(pnc_name)
+    if uid is None:
+        await interaction.response.send_message(f"No verified member matches `{roblox_username or pnc_name}`.", ephemeral=True)
+        return
+
+    verification = get_user(shard, uid)["verification"]
+    embed = discord.Embed(title="Verification Lookup", color=discord.Color.blue())
+    embed.add_field(name="Member", value=f"<@{uid}> ({uid})", inline=False)
+    embed.add_field(name="Roblox Username", value=verification.get("roblox_username", "N/A"), inline=True)
+    embed.add_field(name="PNC Full Name", value=verification.get("pnc_full_name", "N/A"), inline=True)
+    if verification.get("verified_at"):
+        embed.add_field(name="Verified", value=f"<t:{int(datetime.datetime.fromisoformat(verification['verified_at']).timestamp())}:R>", inline=True)
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+@app_commands.command(name='sendverifybutton', description='(Owner Only) Sends the "Verify" button to the current channel.')
+@app_commands.default_permissions(manage_guild=False)
+@app_commands.check(is_co_owner)
+@app_commands.guild_only()
+async def send_verify_button(interaction: discord.Interaction):
+    await interaction.response.defer(ephemeral=True)
+    verify_channel_id = interaction_shard(interaction).setting("verify_channel_id")
+
+    if interaction.channel.id != verify_channel_id:
+        await interaction.followup.send(f"This command should ideally be used in the designated verify channel (<#{verify_channel_id}>).", ephemeral=True)
+
+    embed = discord.Embed(
+        title="Welcome, New Arrival! Please Verify.",
+        description="Click the button below to verify your account and gain full access to the server as a Campton Citizen!\n\n**You will be asked for your Roblox Username and Project New Campton Full Name.**",
+        color=discord.Color.purple()
+    )
+    await interaction.channel.send(embed=embed, view=VerifyView())
+    await interaction.followup.send("The 'Verify' button has been sent to this channel.", ephemeral=True)
+
+# ────────────────────────── market controls ────────────────────────
+@app_commands.command(name='manualconvert', description='(Owner Only) Manually triggers the crypto to cash conversion for all users.')
+@app_commands.default_permissions(manage_guild=False)
+@app_commands.check(is_co_owner)
+@app_commands.guild_only()
+async def manual_convert(interaction: discord.Interaction):
+    await interaction.response.defer(ephemeral=True)
+    shard = interaction_shard(interaction)
+    log.info(f"CMD_MANUALCONVERT: Manual crypto to cash conversion triggered by {interaction.user.display_name} ({interaction.user.id}).")
+    
+    converted_count = await work_scheduler.run("bulk", _perform_crypto_to_cash_conversion, shard)
+    # A manual run restarts the weekly cadence; scheduled runs leave their due time to MarketScheduler._fire.
+    market_scheduler.reschedule(shard, "conversion", discord.utils.utcnow() + datetime.timedelta(days=7))
+    await save_data(shard)
+    
+    await interaction.followup.send(f"Manual crypto to cash conversion initiated. {converted_count} users had their Campton Coin converted. All affected users are now on a buy cooldown until the next price update.", ephemeral=True)
+
+@app_commands.command(name='setprice', description='(Owner) Manually set the price of Campton Coin.')
+@app_commands.default_permissions(administrator=True)
+@app_commands.describe(amount='The new price for Campton Coin (e.g., 150.75).')
+@app_commands.check(is_owner_only)
+@app_commands.guild_only()
+async def set_price_cmd(interaction: discord.Interaction, amount: float):
+    await interaction.response.defer(ephemeral=True)
+    shard = interaction_shard(interaction)
+
+    if amount <= 0:
+        await interaction.followup.send("The price must be a positive number.", ephemeral=True)
+        return
+
+    if amount < MIN_PRICE or amount > MAX_PRICE:
+        await interaction.followup.send(f"The price must be between {MIN_PRICE:.2f} and {MAX_PRICE:.2f} dollars.", ephemeral=True)
+        return
+    
+    new_price = round(amount, 2)
+
+    shard.data["coins"][CAMPTOM_COIN_NAME]["price"] = new_price
+    shard.touch_prices()
+    await save_data(shard)
+
+    public_announcement = f"📈 The Campton Coin price has been manually set to **{new_price:.2f} dollars**."
+    await interaction.channel.send(public_announcement)
+
+    await interaction.followup.send(f"✅ You successfully updated the price to {new_price:.2f}.", ephemeral=True)
+    
+    log.info(f"CMD_SETPRICE: Campton Coin price manually set to {new_price:.2f} by {interaction.user.display_name}.")
+
+@app_commands.command(name='save', description='(Owner) Manually save all market data.')
+@app_commands.default_permissions(manage_guild=False)
+@app_commands.check(is_co_owner)
+@app_commands.guild_only()
+async def save_cmd(interaction: discord.Interaction):
+    await interaction.response.defer(ephemeral=True)
+    shard = interaction_shard(interaction)
+    try:
+        await save_data(shard)
+        await interaction.followup.send("✅ Market data saved (local & Discord backup attempted). Check logs for details.", ephemeral=True)
+        log.info(f"CMD_SAVE: Manual save triggered by {interaction.user.display_name}. Discord backup attempted.")
+    except Exception as e:
+        await interaction.followup.send(f"❌ Error during save: {e}", ephemeral=True)
+        log.error(f"CMD_SAVE: Manual save failed: {e}")
+
+@app_commands.command(name='guildsetting', description='(Owner) Configure a channel or role for this server\'s market.')
+@app_commands.default_permissions(manage_guild=False)
+@app_commands.describe(setting='The setting to change.', value='Channel or role ID. Use 0 to clear it.')
+@app_commands.choices(setting=[
+    app_commands.Choice(name='Announcement Channel', value='announcement_channel_id'),
+    app_commands.Choice(name='Verify Channel', value='verify_channel_id'),
+    app_commands.Choice(name='New Arrival Role', value='new_arrival_role_id'),
+    app_commands.Choice(name='Campton Citizen Role', value='campton_citizen_role_id'),
+    app_commands.Choice(name='Market Investor Role', value='market_investor_role_id'),
+])
+@app_commands.check(is_co_owner)
+@app_commands.guild_only()
+async def guild_setting(interaction: discord.Interaction, setting: app_commands.Choice[str], value: str):
+    await interaction.response.defer(ephemeral=True)
+    shard = interaction_shard(interaction)
+
+    if not value.isdigit():
+        await interaction.followup.send("The value must be a numerical channel or role ID.", ephemeral=True)
+        return
+
+    settings = shard.data.setdefault("settings", {})
+    if int(value) == 0:
+        settings.pop(setting.value, None)
+    else:
+        settings[setting.value] = int(value)
+    await save_data(shard)
+
+    await interaction.followup.send(f"✅ {setting.name} set to `{shard.setting(setting.value)}`.", ephemeral=True)
+    log.info(f"CMD_GUILDSETTING: {setting.value} set to {value} in guild {shard.guild_id} by {interaction.user.display_name}.")
+
+async def setup(bot: commands.Bot):
+    register_commands(bot, globals())
@@ -0,0 +1,445 @@
+"""Owner diagnostics: cache, queue and memory stats, loop profiling, exports and process-pool jobs."""
+import asyncio
+import datetime
+import discord
+import gc
+import io
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import timedelta
+from discord import app_commands
+from discord.ext import commands
+from typing import Any, Iterator
+
+import market_jobs
+from bot import (
+    background_tasks, bot, CAMPTOM_COIN_NAME, interaction_shard, is_co_owner, Job, jobs,
+    join_ingestor, LedgerView, log, loop_watchdog, market, market_scheduler, MarketShard,
+    MAX_PRICE, MAX_TRACKED_JOBS, MIN_PRICE, position_cost, register_commands, run_cpu, shards,
+    snapshot_shard, submit_job, user_cache, VOLATILITY_LEVELS, work_scheduler,
+)
+
+# ────────────────────────── cache & queue stats ────────────────────
+@app_commands.command(name='cachestats', description='(Owner) Shows user/member cache hit and miss counters.')
+@app_commands.default_permissions(manage_guild=False)
+@app_commands.check(is_co_owner)
+async def cache_stats(interaction: discord.Interaction):
+    embeds = []
+    caches = [("User/Member Cache", user_cache)]
+    if interaction.guild_id:
+        caches.append(("Response Cache (this server)", interaction_shard(interaction).responses))
+    for title, cache in caches:
+        embed = discord.Embed(title=title, color=discord.Color.dark_grey())
+        for name, value in cache.stats().items():
+            embed.add_field(name=name.replace("_", " ").title(), value=str(value), inline=True)
+        embeds.append(embed)
+    await interaction.response.send_message(embeds=embeds, ephemeral=True)
+
+@app_commands.command(name='joinstats', description='(Owner) Shows the join queue depth and burst-mode counters.')
+@app_commands.default_permissions(manage_guild=False)
+@app_commands.check(is_co_owner)
+async def join_stats(interaction: discord.Interaction):
+    embed = discord.Embed(title="Join Queue", color=discord.Color.dark_grey())
+    for name, value in join_ingestor.stats().items():
+        embed.add_field(name=name.replace("_", " ").title(), value=str(value), inline=True)
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+@app_commands.command(name='admissionstats', description='(Owner) Shows command admission, load-shedding and work lane counters.')
+@app_commands.default_permissions(manage_guild=False)
+@app_commands.check(is_co_owner)
+async def admission_stats(interaction: discord.Interaction):
+    embeds = []
+    for title, stats in (("Command Admission", bot.tree.stats()), ("Work Lanes", work_scheduler.stats())):
+        embed = discord.Embed(title=title, color=discord.Color.dark_grey())
+        for name, value in stats.items():
+            embed.add_field(name=name.replace("_", " ").title(), value=str(value), inline=True)
+        embeds.append(embed)
+    await interaction.response.send_message(embeds=embeds, ephemeral=True)
+
+# ────────────────────────── memory diagnostics ─────────────────────
+TRACE_FRAMES = 5
+TOP_ALLOCATIONS = 10
+
+def format_bytes(n: float) -> str:
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if abs(n) < 1024 or unit == "GiB":
+            return f"{n:.1f} {unit}" if unit != "B" else f"{int(n)} B"
+        n /= 1024
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # peak, where /proc is missing
+
+def task_counts() -> dict[str, int]:
+    counts: dict[str, int] = {}
+    for task in asyncio.all_tasks():
+        name = task.get_name().split(":")[0]
+        counts[name] = counts.get(name, 0) + 1
+    return dict(sorted(counts.items(), key=lambda kv: kv[1], reverse=True))
+
+def discord_cache_counts() -> dict[str, int]:
+    return {
+        "guilds": len(bot.guilds),
+        "members": sum(len(g.members) for g in bot.guilds),
+        "users": len(bot.users),
+        "channels": sum(len(g.channels) for g in bot.guilds),
+        "roles": sum(len(g.roles) for g in bot.guilds),
+        "messages": len(bot.cached_messages),
+        "emojis": len(bot.emojis),
+    }
+
+@app_commands.command(name='memstats', description='(Owner) Shows memory use, cache sizes, pending tasks and ledger size.')
+@app_commands.default_permissions(manage_guild=False)
+@app_commands.check(is_co_owner)
+@app_commands.guild_only()
+async def mem_stats(interaction: discord.Interaction):
+    await interaction.response.defer(ephemeral=True)
+    shard = interaction_shard(interaction)
+    sizes = await run_cpu(market_jobs.section_sizes, snapshot_shard(shard))
+
+    overview = discord.Embed(title="Memory Overview", color=discord.Color.dark_grey())
+    overview.add_field(name="RSS", value=format_bytes(rss_bytes()), inline=True)
+    overview.add_field(name="GC Counts", value=" / ".join(str(c) for c in gc.get_count()), inline=True)
+    overview.add_field(name="Uncollectable", value=str(len(gc.garbage)), inline=True)
+    overview.add_field(name="Tracemalloc", value="on" if tracemalloc.is_tracing() else "off (`/memtrace start`)", inline=True)
+    overview.add_field(name="discord.py Cache", value="\n".join(f"{k}: {v}" for k, v in discord_cache_counts().items()), inline=True)
+    overview.add_field(name="Bot Caches", value=(
+        f"user cache: {user_cache.stats()['size']}\n"
+        f"response caches: {sum(s.responses.stats()['size'] for s in shards.values())}\n"
+        f"shards loaded: {len(shards)}\n"
+        f"tracked jobs: {len(jobs)} / purges: {len(market.purge_jobs)}"
+    ), inline=True)
+    tasks = task_counts()
+    overview.add_field(name=f"Tasks ({sum(tasks.values())}, {len(background_tasks)} fire-and-forget)",
+                       value="\n".join(f"{name}: {count}" for name, count in list(tasks.items())[:10]) or "none", inline=False)
+
+    ledger = discord.Embed(title="Market Data (this server, serialized)", color=discord.Color.dark_grey())
+    ledger.add_field(name="Total", value=format_bytes(sizes["total"]), inline=True)
+    ledger.add_field(name="Users", value=str(sizes["users"]), inline=True)
+    ledger.add_field(name="Per User", value=format_bytes(sizes["per_user"]), inline=True)
+    ledger.add_field(name="Sections", value="\n".join(f"{k}: {format_bytes(v)}" for k, v in sizes["sections"].items()), inline=False)
+    await interaction.followup.send(embeds=[overview, ledger], ephemeral=True)
+
+@app_commands.command(name='memtrace', description='(Owner) Starts/stops tracemalloc or shows top allocations and growth since last snapshot.')
+@app_commands.default_permissions(manage_guild=False)
+@app_commands.choices(action=[
+    app_commands.Choice(name='Start Tracing', value='start'),
+    app_commands.Choice(name='Snapshot & Diff', value='snapshot'),
+    app_commands.Choice(name='Stop Tracing', value='stop'),
+])
+@app_commands.check(is_co_owner)
+async def mem_trace(interaction: discord.Interaction, action: app_commands.Choice[str]):
+    if action.value == "start":
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACE_FRAMES)
+        market.trace_snapshot = None
+        await interaction.response.send_message("✅ tracemalloc started. Take snapshots with `/memtrace Snapshot & Diff`.", ephemeral=True)
+        return
+    if action.value == "stop":
+        tracemalloc.stop()
+        market.trace_snapshot = None
+        await interaction.response.send_message("✅ tracemalloc stopped.", ephemeral=True)
+        return
+
+    await interaction.response.defer(ephemeral=True)
+    type_counts: dict[str, int] = {}
+    for obj in gc.get_objects():
+        name = type(obj).__name__
+        type_counts[name] = type_counts.get(name, 0) + 1
+    type_growth = sorted(((n, c - market.type_counts.get(n, 0)) for n, c in type_counts.items()), key=lambda kv: kv[1], reverse=True)
+    lines = ["# Object counts (growth since last snapshot)"]
+    lines += [f"{name}: {type_counts[name]} ({growth:+d})" for name, growth in type_growth[:TOP_ALLOCATIONS]]
+    market.type_counts = type_counts
+
+    if tracemalloc.is_tracing():
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        current, peak = tracemalloc.get_traced_memory()
+        lines += ["", f"# Traced memory: {format_bytes(current)} (peak {format_bytes(peak)})", "", "# Top allocation sites"]
+        for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]:
+            lines.append(f"{format_bytes(stat.size)} in {stat.count} blocks: {stat.traceback}")
+        if market.trace_snapshot is not None:
+            lines += ["", "# Growth since last snapshot"]
+            for stat in snapshot.compare_to(market.trace_snapshot, "lineno")[:TOP_ALLOCATIONS]:
+                lines.append(f"{format_bytes(stat.size_diff)} ({stat.count_diff:+d} blocks): {stat.traceback}")
+        market.trace_snapshot = snapshot
+    else:
+        lines += ["", "tracemalloc is off; start it for allocation sites."]
+
+    await interaction.followup.send(
+        file=discord.File(io.BytesIO("\n".join(lines).encode()), filename=f"memtrace_{discord.utils.utcnow().strftime('%Y%m%d-%H%M%S')}.txt"),
+        ephemeral=True
+    )
+    log.info(f"CMD_MEMTRACE: Memory snapshot taken by {interaction.user.display_name}.")
+
+# ────────────────────────── event-loop profiler ────────────────────
+PROFILE_MAX_SECONDS = 60
+
+def sample_stacks(thread_id: int, seconds: float, interval: float) -> tuple[dict[str, int], int]:
+    """Sample one thread's stack every `interval` seconds. Returns (collapsed stack -> count, samples)."""
+    counts: dict[str, int] = {}
+    samples = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        frame = sys._current_frames().get(thread_id)
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        if stack:
+            key = ";".join(reversed(stack))
+            counts[key] = counts.get(key, 0) + 1
+            samples += 1
+        time.sleep(interval)
+    return counts, samples
+
+@app_commands.command(name='looplag', description='(Owner) Shows event-loop lag and the most recent blocking call site.')
+@app_commands.default_permissions(manage_guild=False)
+@app_commands.check(is_co_owner)
+async def loop_lag(interaction: discord.Interaction):
+    embed = discord.Embed(title="Event Loop", color=discord.Color.dark_grey())
+    for name, value in loop_watchdog.stats().items():
+        embed.add_field(name=name.replace("_", " ").title(), value=str(value), inline=True)
+    if loop_watchdog.last_stall:
+        at, stalled, site = loop_watchdog.last_stall
+        embed.add_field(name=f"Last Stall ({stalled * 1000:.0f} ms, {at})", value=f"```{site[-1000:]}```", inline=False)
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+@app_commands.command(name='profile', description='(Owner) Samples the event loop for N seconds and returns collapsed stacks.')
+@app_commands.default_permissions(manage_guild=False)
+@app_commands.describe(seconds='How long to sample (1-60).', interval_ms='Milliseconds between samples (default 5).')
+@app_commands.check(is_co_owner)
+async def profile_cmd(interaction: discord.Interaction, seconds: int = 10, interval_ms: int = 5):
+    if not (1 <= seconds <= PROFILE_MAX_SECONDS) or not (1 <= interval_ms <= 1000):
+        await interaction.response.send_message(f"Seconds must be 1-{PROFILE_MAX_SECONDS} and interval 1-1000 ms.", ephemeral=True)
+        return
+    await interaction.response.defer(ephemeral=True)
+    # The sampler runs in a worker thread and looks at the loop thread, which keeps running normally.
+    counts, samples = await asyncio.to_thread(sample_stacks, threading.get_ident(), seconds, interval_ms / 1000)
+    collapsed = "\n".join(f"{stack} {count}" for stack, count in sorted(counts.items(), key=lambda kv: kv[1], reverse=True))
+    await interaction.followup.send(
+        f"Collected {samples} samples over {seconds}s. Feed the file to flamegraph.pl or speedscope.",
+        file=discord.File(io.BytesIO(collapsed.encode()), filename=f"profile_{discord.utils.utcnow().strftime('%Y%m%d-%H%M%S')}.folded"),
+        ephemeral=True
+    )
+    log.info(f"CMD_PROFILE: {seconds}s profile ({samples} samples) taken by {interaction.user.display_name}.")
+
+# ────────────────────────── process-pool jobs ──────────────────────
+def job_result_message(job: Job) -> tuple[discord.Embed, discord.File | None]:
+    embed = discord.Embed(title=f"Job #{job.id}: {job.kind}", color=discord.Color.dark_grey())
+    embed.add_field(name="Status", value=job.status, inline=True)
+    embed.add_field(name="Submitted", value=f"<t:{int(job.created_at.timestamp())}:R>", inline=True)
+    if job.status == "failed":
+        embed.add_field(name="Error", value=str(job.future.exception())[:1000], inline=False)
+    if job.status != "done":
+        return embed, None
+
+    result = job.future.result()
+    if job.kind == "json_export":
+        return embed, discord.File(fp=io.BytesIO(result), filename=f"market_data_{job.guild_id}_export.json")
+    for key, value in result.items():
+        embed.add_field(name=key.replace("_", " ").title(), value=str(value), inline=True)
+    return embed, None
+
+# ────────────────────────── streaming export ───────────────────────
+# Rows are generated from the published LedgerView (immutable, so the generator can run in a worker
+# thread while the loop keeps writing) plus copies of the verification records and price history taken
+# on the loop, encoded line by line and gzipped into upload-sized parts.
+EXPORT_COLUMNS = {
+    "users": ["user_id", "balance", "holdings_value", "net_worth", "realized_pnl"],
+    "holdings": ["user_id", "coin", "quantity", "cost", "value", "unrealized_pnl"],
+    "verification": ["user_id", "roblox_username", "pnc_full_name", "verified_at"],
+    "prices": ["timestamp", "coin", "price"],
+}
+EXPORT_MIN_PART_BYTES = 1024 * 1024
+VERIFICATION_FIELDS = ("roblox_username", "pnc_full_name", "verified_at")
+
+def export_inputs(shard: MarketShard, section: str, verified_only: bool) -> tuple[dict[int, dict[str, str]], list[tuple[str, dict[str, float]]]]:
+    """Copy what export_rows needs beyond the view (verification records, price history). Call on the loop."""
+    verifications: dict[int, dict[str, str]] = {}
+    if section == "verification" or verified_only:
+        for uid, user in shard.data["users"].items():
+            if verification := user.get("verification"):
+                verifications[int(uid)] = {field: verification.get(field) or "" for field in VERIFICATION_FIELDS}
+    history = [(timestamp, dict(prices_at)) for timestamp, prices_at in shard.data.get("price_history", [])] if section == "prices" else []
+    return verifications, history
+
+def export_rows(view: LedgerView, verifications: dict[int, dict[str, str]], price_history: list[tuple[str, dict[str, float]]],
+                section: str, min_net_worth: float | None, verified_only: bool, since: datetime.datetime | None) -> Iterator[dict[str, Any]]:
+    if section == "prices":
+        for timestamp, prices_at in price_history:
+            if since and datetime.datetime.fromisoformat(timestamp) < since:
+                continue
+            for coin, coin_price in prices_at.items():
+                yield {"timestamp": timestamp, "coin": coin, "price": coin_price}
+        return
+
+    for segment in view.segments:
+        for uid, user in segment.items():
+            verification = verifications.get(uid, {})
+            if verified_only and not verification.get("verified_at"):
+                continue
+            values = {coin: qty * view.prices.get(coin, 0.0) for coin, qty in user.portfolio.items()}
+            if min_net_worth is not None and user.balance + sum(values.values()) < min_net_worth:
+                continue
+            if section == "users":
+                holdings_value = sum(values.values())
+                yield {"user_id": uid, "balance": round(user.balance, 2), "holdings_value": round(holdings_value, 2),
+                       "net_worth": round(user.balance + holdings_value, 2), "realized_pnl": round(user.realized_pnl, 2)}
+            elif section == "holdings":
+                for coin, qty in user.portfolio.items():
+                    cost = position_cost(qty, user.cost_basis.get(coin), view.prices.get(coin, 0.0))
+                    yield {"user_id": uid, "coin": coin, "quantity": round(qty, 3), "cost": round(cost, 2),
+                           "value": round(values[coin], 2), "unrealized_pnl": round(values[coin] - cost, 2)}
+            else:
+                yield {"user_id": uid, **{field: verification.get(field, "") for field in VERIFICATION_FIELDS}}
+
+@app_commands.command(name='export', description='(Owner) Export the ledger as compressed CSV or NDJSON attachments.')
+@app_commands.default_permissions(manage_guild=False)
+@app_commands.describe(
+    section='What to export.',
+    file_format='CSV or newline-delimited JSON.',
+    min_net_worth='Only members worth at least this much.',
+    verified_only='Only members who completed verification.',
+    since_days='Prices: only the last N days of history.'
+)
+@app_commands.choices(
+    section=[
+        app_commands.Choice(name='Users', value='users'),
+        app_commands.Choice(name='Holdings', value='holdings'),
+        app_commands.Choice(name='Verification', value='verification'),
+        app_commands.Choice(name='Price History', value='prices'),
+    ],
+    file_format=[
+        app_commands.Choice(name='CSV', value='csv'),
+        app_commands.Choice(name='NDJSON', value='ndjson'),
+    ]
+)
+@app_commands.check(is_co_owner)
+@app_commands.guild_only()
+async def export_cmd(interaction: discord.Interaction, section: app_commands.Choice[str], file_format: app_commands.Choice[str],
+                     min_net_worth: float = None, verified_only: bool = False, since_days: int = None):
+    await interaction.response.defer(ephemeral=True)
+    shard = interaction_shard(interaction)
+    fmt = file_format.value
+    columns = EXPORT_COLUMNS[section.value]
+    since = discord.utils.utcnow() - timedelta(days=since_days) if since_days else None
+
+    # Taken here, on the loop: the rows below are generated from these copies in a worker thread.
+    verifications, price_history = export_inputs(shard, section.value, verified_only)
+    rows = export_rows(shard.view, verifications, price_history, section.value, min_net_worth, verified_only, since)
+    max_bytes = max(EXPORT_MIN_PART_BYTES, interaction.guild.filesize_limit)
+    parts = market_jobs.gzip_parts(
+        market_jobs.encode_rows(rows, fmt, columns), max_bytes,
+        header=market_jobs.csv_header(columns) if fmt == "csv" else b"",
+    )
+
+    stamp = discord.utils.utcnow().strftime('%Y%m%d-%H%M%S')
+    count = 0
+    # Each part is built in a worker thread and uploaded before the next is started.
+    while (part := await asyncio.to_thread(next, parts, None)) is not None:
+        count += 1
+        await interaction.followup.send(
+            file=discord.File(io.BytesIO(part), filename=f"{section.value}_{shard.guild_id}_{stamp}.part{count:03d}.{fmt}.gz"),
+            ephemeral=True
+        )
+
+    await interaction.followup.send(f"✅ Export of **{section.name}** finished in {count} part(s)." if count else "Nothing matched those filters.", ephemeral=True)
+    log.info(f"CMD_EXPORT: {section.value} export ({fmt}) for guild {shard.guild_id} by {interaction.user.display_name}: {count} part(s).")
+
+@app_commands.command(name='jobsubmit', description='(Owner) Run a CPU-heavy market job in the background.')
+@app_commands.default_permissions(manage_guild=False)
+@app_commands.describe(
+    kind='The job to run.',
+    steps='Price simulation: number of future price updates to simulate.',
+    runs='Price simulation: number of simulated paths.'
+)
+@app_commands.choices(kind=[
+    app_commands.Choice(name='Price Simulation', value='price_simulation'),
+    app_commands.Choice(name='Conversion Preview', value='conversion_preview'),
+    app_commands.Choice(name='Full JSON Export', value='json_export'),
+])
+@app_commands.check(is_co_owner)
+@app_commands.guild_only()
+async def job_submit(interaction: discord.Interaction, kind: app_commands.Choice[str], steps: int = 10, runs: int = 1000):
+    shard = interaction_shard(interaction)
+
+    if kind.value == "price_simulation":
+        if not (1 <= steps <= 1000) or not (1 <= runs <= 100000):
+            await interaction.response.send_message("Steps must be 1-1000 and runs 1-100000.", ephemeral=True)
+            return
+        job = submit_job(
+            kind.value, shard, interaction.user.id, market_jobs.simulate_prices,
+            shard.data["coins"][CAMPTOM_COIN_NAME]["price"], steps, runs, VOLATILITY_LEVELS, MIN_PRICE, MAX_PRICE,
+        )
+    elif kind.value == "conversion_preview":
+        job = submit_job(kind.value, shard, interaction.user.id, market_jobs.conversion_preview, snapshot_shard(shard), CAMPTOM_COIN_NAME)
+    else:
+        job = submit_job(kind.value, shard, interaction.user.id, market_jobs.dump_json, snapshot_shard(shard))
+
+    await interaction.response.send_message(f"✅ Submitted job **#{job.id}** ({kind.name}). Use `/jobstatus {job.id}` to check on it.", ephemeral=True)
+
+@app_commands.command(name='jobstatus', description='(Owner) Show a background job\'s status and result, or list recent jobs.')
+@app_commands.default_permissions(manage_guild=False)
+@app_commands.describe(job_id='The job to inspect. Leave empty to list recent jobs.')
+@app_commands.check(is_co_owner)
+async def job_status(interaction: discord.Interaction, job_id: int = None):
+    if job_id is None:
+        lines = [f"#{job.id} {job.kind} — {job.status}" for job in reversed(jobs.values())]
+        await interaction.response.send_message("\n".join(lines[:20]) or "No jobs submitted yet.", ephemeral=True)
+        return
+
+    job = jobs.get(job_id)
+    if job is None:
+        await interaction.response.send_message(f"No job #{job_id} found (only the last {MAX_TRACKED_JOBS} are kept).", ephemeral=True)
+        return
+
+    embed, file = job_result_message(job)
+    if file:
+        await interaction.response.send_message(embed=embed, file=file, ephemeral=True)
+    else:
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+@app_commands.command(name='jobcancel', description='(Owner) Cancel a queued background job.')
+@app_commands.default_permissions(manage_guild=False)
+@app_commands.describe(job_id='The job to cancel.')
+@app_commands.check(is_co_owner)
+async def job_cancel(interaction: discord.Interaction, job_id: int):
+    job = jobs.get(job_id)
+    if job is None:
+        await interaction.response.send_message(f"No job #{job_id} found.", ephemeral=True)
+        return
+
+    if job.future.cancel():
+        log.info(f"JOBS: Job #{job.id} cancelled by {interaction.user.display_name}.")
+        await interaction.response.send_message(f"✅ Job #{job.id} cancelled.", ephemeral=True)
+    else:
+        await interaction.response.send_message(f"Job #{job.id} is already {job.status} and can no longer be cancelled.", ephemeral=True)
+
+@app_commands.command(name='schedule', description='(Owner) Shows when this server\'s market jobs will next run.')
+@app_commands.default_permissions(manage_guild=False)
+@app_commands.check(is_co_owner)
+@app_commands.guild_only()
+async def schedule_cmd(interaction: discord.Interaction):
+    shard = interaction_shard(interaction)
+    embed = discord.Embed(title="Market Schedule", color=discord.Color.dark_grey())
+    for name, due in market_scheduler.upcoming(shard):
+        value = f"<t:{int(due.timestamp())}:F> (<t:{int(due.timestamp())}:R>)" if due else "Not scheduled"
+        embed.add_field(name=name.replace("_", " ").title(), value=value, inline=False)
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+async def setup(bot: commands.Bot):
+    register_commands(bot, globals())
@@ -0,0 +1,319 @@
+"""Member-facing market commands: balance, trading, transfers, withdrawals and price views."""
+import discord
+from decimal import Decimal, ROUND_DOWN
+from discord import app_commands
+from discord.ext import commands
+from typing import Any, Callable
+
+from bot import (
+    bot, buy_coin_logic, CAMPTOM_COIN_NAME, check_and_assign_investor_role, D, EMPTY_USER_VIEW,
+    get_user, interaction_shard, log, MarketShard, money, OWNER_ID, position_cost, price,
+    record_acquisition, record_disposal, record_trade, register_commands, resolve_user, save_data,
+    sell_coin_logic, too_many_decimals,
+)
+
+# ────────────────────────── cached read-only responses ─────────────
+def cached_embed(shard: MarketShard, key: tuple, render: Callable[[], discord.Embed]) -> discord.Embed:
+    """Render once per (command, subject, state version). Rendering never awaits, so there is nothing to coalesce."""
+    rendered = shard.responses.get(key)
+    if rendered is None:
+        rendered = render().to_dict()
+        shard.responses.put(key, rendered)
+    return discord.Embed.from_dict(rendered)
+
+def render_balance(shard: MarketShard, target_member: discord.Member, is_self: bool) -> discord.Embed:
+    # Everything shown comes from one ledger version: the valuation cache when it is at the published
+    # view's version (the normal case, both advance together in touch_*), otherwise re-derived from the view.
+    view = shard.view
+    valuation = shard.valuation
+    uid = target_member.id
+    user = view.user(uid) or EMPTY_USER_VIEW
+    if valuation.version == view.version:
+        cash = valuation.cash.get(uid, Decimal("0"))
+        positions = {coin: (valuation.quantities[uid][coin], value) for coin, value in valuation.coin_values.get(uid, {}).items()}
+    else:
+        cash = Decimal(str(user.balance))
+        positions = {coin: (D(qty), (Decimal(str(view.prices.get(coin, 0.0))) * D(qty)).quantize(Decimal("0.01")))
+                     for coin, qty in user.portfolio.items()}
+    embed = discord.Embed(title=f"{target_member.display_name}'s Portfolio", color=discord.Color.blue())
+    embed.add_field(name="Cash Balance", value=f"{cash:.2f} dollars", inline=False)
+
+    if positions:
+        portfolio_str = ""
+        unrealized = Decimal("0.00")
+        for coin_name, (quantity, coin_value) in positions.items():
+            cost = position_cost(float(quantity), user.cost_basis.get(coin_name), view.prices.get(coin_name, 0.0))
+            coin_pnl = coin_value - Decimal(str(cost)).quantize(Decimal("0.01"))
+            unrealized += coin_pnl
+            portfolio_str += f"- {coin_name}: **{quantity:.3f}** units (Value: {money(coin_value)}, P&L: {coin_pnl:+.2f})\n"
+        embed.add_field(name="Holdings", value=portfolio_str, inline=False)
+        embed.add_field(name="Net Worth", value=money(cash + sum((value for _, value in positions.values()), Decimal("0.00"))), inline=False)
+        embed.add_field(name="Unrealized P&L", value=f"{unrealized:+.2f} dollars", inline=True)
+    else:
+        embed.add_field(name="Holdings", value="You own no cryptocurrencies." if is_self else f"{target_member.display_name} owns no cryptocurrencies.", inline=False)
+    embed.add_field(name="Realized P&L", value=f"{user.realized_pnl:+.2f} dollars", inline=True)
+    if user.withdrawal_hold:
+        embed.add_field(name="On Hold (Withdrawals)", value=f"{user.withdrawal_hold:.2f} dollars", inline=True)
+    return embed
+
+def render_price(shard: MarketShard) -> discord.Embed:
+    current_coin_price = shard.view.prices[CAMPTOM_COIN_NAME]
+    return discord.Embed(
+        title="📈 Current Campton Coin Price 📉",
+        description=f"The current price of Campton Coin is **{current_coin_price:.2f} dollars**.",
+        color=discord.Color.blue()
+    )
+
+# ────────────────────────── Commands ───────────────────────────────
+@app_commands.command(name='balance', description='Shows your current balance and portfolio, or another member\'s.')
+@app_commands.guild_only()
+async def balance(interaction: discord.Interaction, member: discord.Member = None):
+    await interaction.response.defer(ephemeral=True) 
+    shard = interaction_shard(interaction)
+
+    target_member = member or interaction.user 
+
+    if target_member.bot:
+        await interaction.followup.send(f"{target_member.display_name} is a bot and does not have a market balance.", ephemeral=True)
+        return
+
+    is_self = target_member == interaction.user
+    key = ("balance", target_member.id, target_member.display_name, is_self,
+           shard.user_version(target_member.id), shard.price_version)
+    embed = cached_embed(shard, key, lambda: render_balance(shard, target_member, is_self))
+    await interaction.followup.send(embed=embed)
+
+@app_commands.command(name='buy', description='Buys Campton Coin with a specified amount of cash (up to 2 decimal places for cash).')
+@app_commands.describe(amount_of_cash='The amount of cash you want to spend (e.g., 50.00).')
+@app_commands.guild_only()
+async def buy(interaction: discord.Interaction, amount_of_cash: float):
+    await interaction.response.defer(ephemeral=True)
+    shard = interaction_shard(interaction)
+    coin_name = CAMPTOM_COIN_NAME
+
+    user_data = get_user(shard, interaction.user.id) 
+    if user_data.get("on_buy_cooldown", False): 
+        await interaction.followup.send("You cannot buy Campton Coin until after the next market price update (approximately every 3 days).", ephemeral=True)
+        return
+
+    if amount_of_cash <= 0:
+        await interaction.followup.send("You must spend a positive amount of cash.", ephemeral=True)
+        return
+
+    s_cash = str(f"{amount_of_cash:.3f}")
+    if '.' in s_cash:
+        decimal_part_cash = s_cash.split('.')[1]
+        if len(decimal_part_cash) > 2 and amount_of_cash * 100 != int(amount_of_cash * 100):
+            await interaction.followup.send("You can only spend cash with up to 2 decimal places (e.g., 50.00).", ephemeral=True)
+            return
+    
+    current_coin_price = price(shard) 
+    if current_coin_price <= 0: 
+        await interaction.followup.send("Cannot buy Campton Coin right now, its price is too low or zero.", ephemeral=True)
+        return
+
+    quantity_of_coins_to_buy = Decimal(str(amount_of_cash)) / current_coin_price
+    quantity_of_coins_to_buy = quantity_of_coins_to_buy.quantize(Decimal("0.000"), rounding=ROUND_DOWN) 
+
+    result = buy_coin_logic(shard, interaction.user.id, coin_name, float(quantity_of_coins_to_buy)) 
+    
+    if "Successfully bought" in result:
+        await save_data(shard)
+        await interaction.followup.send(f"Successfully spent {amount_of_cash:.2f} dollars to buy {float(quantity_of_coins_to_buy):.3f} {coin_name}(s). Your new cash balance is {get_user(shard, interaction.user.id)['balance']:.2f} dollars.", ephemeral=True)
+        check_and_assign_investor_role(shard, interaction.user.id, interaction.guild, interaction.user)
+    else:
+        await interaction.followup.send(result, ephemeral=True)
+
+@app_commands.command(name='sell', description='Sells a specified quantity of Campton Coin (up to 3 decimal places).')
+@app_commands.describe(quantity='The number of Campton Coins to sell (e.g., 0.123).')
+@app_commands.guild_only()
+async def sell_cmd(interaction: discord.Interaction, quantity: float):
+    await interaction.response.defer(ephemeral=True)
+    shard = interaction_shard(interaction)
+    coin_name = CAMPTOM_COIN_NAME
+
+    if quantity <= 0:
+        await interaction.followup.send("You must sell a positive amount.", ephemeral=True)
+        return
+
+    if too_many_decimals(Decimal(str(quantity)), 3):
+        await interaction.followup.send("You can only sell Campton Coin with up to 3 decimal places (e.g., 0.123).", ephemeral=True)
+        return
+
+    result = sell_coin_logic(shard, interaction.user.id, coin_name, quantity) 
+    if "Successfully sold" in result:
+        await save_data(shard)
+        await interaction.followup.send(result, ephemeral=True)
+        check_and_assign_investor_role(shard, interaction.user.id, interaction.guild, interaction.user)
+    else:
+        await interaction.followup.send(result, ephemeral=True)
+
+async def notify_owner_of_withdrawal(request: dict[str, Any], balance: float) -> bool:
+    try:
+        owner = await resolve_user(OWNER_ID)
+    except discord.HTTPException as e:
+        log.warning(f"WARNING: Could not find the bot owner to notify about withdrawal request #{request['id']}: {e}")
+        return False
+    if not owner:
+        return False
+    embed = discord.Embed(
+        title="❗ New Withdrawal Request ❗",
+        description=f"**{request['name']}** (`{request['user']}`) has requested a withdrawal.",
+        color=discord.Color.red()
+    )
+    embed.add_field(name="Requested Amount", value=f"{request['amount']:.2f} dollars", inline=False)
+    embed.add_field(name="User's Remaining Balance", value=f"{balance:.2f} dollars", inline=False)
+    embed.set_footer(text=f"Request #{request['id']} is on hold. Review the queue with /withdrawals")
+    try:
+        await owner.send(embed=embed)
+        return True
+    except discord.HTTPException:
+        log.warning(f"WARNING: Could not send DM to owner {owner.name} about withdrawal request #{request['id']}. DMs might be disabled.")
+        return False
+
+@app_commands.command(name='withdraw', description='Requests a withdrawal. The amount is held until the owner approves or denies it.')
+@app_commands.describe(amount='The amount of funds to request for withdrawal.')
+@app_commands.guild_only()
+async def withdraw(interaction: discord.Interaction, amount: float):
+    await interaction.response.defer(ephemeral=True)
+    shard = interaction_shard(interaction)
+
+    if amount <= 0:
+        await interaction.followup.send("You must request a positive amount for withdrawal.", ephemeral=True)
+        return
+    if too_many_decimals(Decimal(str(amount)), 2):
+        await interaction.followup.send("You can only withdraw cash with up to 2 decimal places (e.g., 50.00).", ephemeral=True)
+        return
+
+    user_data = get_user(shard, interaction.user.id) 
+    if user_data["balance"] < amount:
+        await interaction.followup.send(f"Insufficient funds. You only have {user_data['balance']:.2f} dollars.", ephemeral=True)
+        return
+
+    request = shard.withdrawals.submit(interaction.user.id, interaction.user.display_name, Decimal(str(amount)))
+    await save_data(shard)
+    log.info(f"CMD_WITHDRAW: Request #{request['id']} for {amount:.2f} dollars queued by {interaction.user.display_name} in guild {shard.guild_id}.")
+    notified = await notify_owner_of_withdrawal(request, user_data["balance"])
+    await interaction.followup.send(
+        f"Your withdrawal request #{request['id']} for {amount:.2f} dollars is queued for owner approval. "
+        f"The amount is on hold: your balance is now {user_data['balance']:.2f} dollars, and it is returned if the request is denied."
+        + ("" if notified else " (The bot owner could not be notified by DM; the request is still in their review queue.)"),
+        ephemeral=True
+    )
+
+@app_commands.command(name='transfer', description='Transfer cash or Campton Coin to another user.')
+@app_commands.describe(
+    recipient='The user to transfer funds/coins to.',
+    amount='The amount to transfer (e.g., 50.00 or 5).',
+    currency_type='The type of currency to transfer.'
+)
+@app_commands.choices(currency_type=[
+    app_commands.Choice(name='Cash', value='cash'),
+    app_commands.Choice(name='Campton Coin', value='campton_coin')
+])
+@app_commands.guild_only()
+async def transfer(interaction: discord.Interaction, recipient: discord.Member, amount: float, currency_type: app_commands.Choice[str]):
+    await interaction.response.defer(ephemeral=True)
+    shard = interaction_shard(interaction)
+
+    if amount <= 0:
+        await interaction.followup.send("You must transfer a positive amount.", ephemeral=True)
+        return
+
+    if currency_type.value == 'campton_coin' and too_many_decimals(Decimal(str(amount)), 3):
+        await interaction.followup.send("You can only transfer Campton Coin with up to 3 decimal places (e.g., 0.123).", ephemeral=True)
+        return
+
+    if interaction.user.id == recipient.id:
+        await interaction.followup.send("You cannot transfer to yourself.", ephemeral=True)
+        return
+
+    sender_data = get_user(shard, interaction.user.id) 
+    recipient_data = get_user(shard, recipient.id)     
+    currency_value = currency_type.value
+    currency_name = currency_type.name
+
+    transfer_successful = False
+    feedback_message = ""
+    recipient_dm_message = ""
+
+    if currency_value == 'cash':
+        amt_decimal = Decimal(str(amount)).quantize(Decimal("0.01"))
+        if D(str(sender_data["balance"])) < amt_decimal:
+            feedback_message = f"Insufficient funds. You only have {sender_data['balance']:.2f} dollars."
+        else:
+            sender_data["balance"] = float(D(str(sender_data["balance"])) - amt_decimal)
+            recipient_data["balance"] = float(D(str(recipient_data["balance"])) + amt_decimal)
+            transfer_successful = True
+            feedback_message = f"Successfully transferred {float(amt_decimal):.2f} dollars to {recipient.display_name}. Your new balance is {sender_data['balance']:.2f} dollars."
+            recipient_dm_message = f"You received {float(amt_decimal):.2f} dollars from {interaction.user.display_name}. Your new balance is {recipient_data['balance']:.2f} dollars."
+    elif currency_value == 'campton_coin':
+        coin_name = CAMPTOM_COIN_NAME
+        amt_decimal = D(str(amount))
+        if coin_name not in sender_data["portfolio"] or D(str(sender_data["portfolio"].get(coin_name, 0.0))) < amt_decimal:
+            feedback_message = f"Insufficient Campton Coins. You only have {D(str(sender_data['portfolio'].get(coin_name, 0.0))):.3f} {coin_name}(s)."
+        else:
+            # A transfer is a disposal at market for the sender and an acquisition at market for the recipient.
+            coin_price = shard.data["coins"][coin_name]["price"]
+            market_value = float(amt_decimal) * coin_price
+            record_disposal(sender_data, coin_name, float(amt_decimal), market_value, coin_price)
+            record_acquisition(recipient_data, coin_name, float(amt_decimal), market_value, coin_price)
+            sender_data["portfolio"][coin_name] = float(D(str(sender_data["portfolio"][coin_name])) - amt_decimal)
+            recipient_data["portfolio"][coin_name] = float(D(str(recipient_data["portfolio"].get(coin_name, 0.0))) + amt_decimal)
+            if D(str(sender_data["portfolio"][coin_name])) <= Decimal("0.0001"):
+                sender_data["portfolio"].pop(coin_name)
+            transfer_successful = True
+            feedback_message = f"Successfully transferred {float(amt_decimal):.3f} {coin_name}(s) to {recipient.display_name}. You now have {D(str(sender_data['portfolio'].get(coin_name, 0.0))):.3f} {coin_name}(s)."
+            recipient_dm_message = f"You received {float(amt_decimal):.3f} {coin_name}(s) from {interaction.user.display_name}. You now have {D(str(recipient_data['portfolio'].get(coin_name, 0.0))):.3f} {coin_name}(s)."
+    else:
+        feedback_message = "Invalid currency type specified."
+
+    if transfer_successful:
+        shard.touch_users(interaction.user.id, recipient.id)
+        if currency_value == 'cash':
+            record_trade(shard, "transfer", interaction.user.id, cash=float(amt_decimal), to=recipient.id)
+        else:
+            record_trade(shard, "transfer", interaction.user.id, CAMPTOM_COIN_NAME, float(amt_decimal), to=recipient.id)
+        await save_data(shard)
+        await interaction.followup.send(feedback_message, ephemeral=True)
+        if recipient_dm_message:
+            try:
+                recipient_embed = discord.Embed(
+                    title=f"💰 {currency_name} Transfer Received! 💰",
+                    description=recipient_dm_message,
+                    color=discord.Color.green()
+                )
+                await recipient.send(embed=recipient_embed)
+            except discord.Forbidden:
+                log.warning(f"WARNING: Could not send DM to {recipient.name}. DMs might be disabled.")
+                await interaction.followup.send(f"Note: Could not DM {recipient.display_name} about the transfer. They might have DMs disabled.", ephemeral=True)
+    else:
+        await interaction.followup.send(feedback_message, ephemeral=True)
+
+@app_commands.command(name='ping', description='Checks the bot\'s latency to Discord.')
+async def ping(interaction: discord.Interaction):
+    await interaction.response.send_message(f"Pong! Latency: {round(bot.latency * 1000)}ms", ephemeral=True)
+
+@app_commands.command(name='viewprice', description='Displays the current price of Campton Coin for everyone.')
+@app_commands.guild_only()
+async def view_price_public_cmd(interaction: discord.Interaction):
+    await interaction.response.defer(ephemeral=False)
+    shard = interaction_shard(interaction)
+    embed = cached_embed(shard, ("viewprice", shard.price_version), lambda: render_price(shard))
+    await interaction.followup.send(embed=embed)
+
+@app_commands.command(name='leaderboard', description='Shows the richest members of this server by net worth.')
+@app_commands.guild_only()
+async def leaderboard(interaction: discord.Interaction):
+    await interaction.response.defer()
+    shard = interaction_shard(interaction)
+
+    def render() -> discord.Embed:
+        lines = [f"{i}. <@{uid}> — {money(worth)}" for i, (uid, worth) in enumerate(shard.valuation.top(10), 1)]
+        return discord.Embed(title="🏆 Net Worth Leaderboard", description="\n".join(lines) or "No investors yet.", color=discord.Color.gold())
+
+    embed = cached_embed(shard, ("leaderboard", shard.ledger_version, shard.price_version), render)
+    await interaction.followup.send(embed=embed)
+
+async def setup(bot: commands.Bot):
+    register_commands(bot, globals())
@@ -0,0 +1,650 @@
+"""Owner moderation commands: message cleanup, purges, lockdowns and announcements."""
+import asyncio
+import datetime
+import discord
+from datetime import timedelta
+from discord import app_commands
+from discord.ext import commands
+
+from bot import (
+    announcement_dispatcher, bot, interaction_shard, is_co_owner, log, market, MarketShard,
+    MAX_TRACKED_JOBS, register_commands, save_data, spawn, work_scheduler,
+)
+
+# ────────────────────────── message cleanup ────────────────────────
+@app_commands.command(name='clearmessages', description='(Owner Only) Clears a specified number of messages from the current channel.')
+@app_commands.default_permissions(manage_guild=False)
+@app_commands.describe(amount='The number of messages to clear (1-100).')
+@app_commands.check(is_co_owner)
+async def clearmessages(interaction: discord.Interaction, amount: int):
+    await interaction.response.defer(ephemeral=True)
+
+    if not (1 <= amount <= 100):
+        await interaction.followup.send("You can only clear between 1 and 100 messages. Use `/purge` for larger cleanups.", ephemeral=True)
+        return
+
+    try:
+        deleted = await interaction.channel.purge(limit=amount)
+        await interaction.followup.send(f"Successfully cleared {len(deleted)} messages.", ephemeral=True)
+        log.info(f"CMD_CLEAR: Cleared {len(deleted)} messages in #{interaction.channel.name} by {interaction.user.display_name}.")
+    except discord.Forbidden:
+        await interaction.followup.send(
+            "I do not have permission to manage messages in this channel. Please ensure I have 'Manage Messages' permission.",
+            ephemeral=True
+        )
+        log.error(f"CMD_CLEAR: Bot lacks 'Manage Messages' permission in #{interaction.channel.name}.")
+    except Exception as e:
+        await interaction.followup.send(f"An unexpected error occurred: {e}", ephemeral=True)
+        log.error(f"CMD_CLEAR: Error clearing messages in #{interaction.channel.name}: {e}")
+
+# ────────────────────────── purge engine ───────────────────────────
+# Discord only bulk-deletes messages younger than 14 days; keep a margin for clock skew and the
+# time a page spends waiting in the batch.
+BULK_DELETE_MAX_AGE = timedelta(days=14) - timedelta(minutes=10)
+SINGLE_DELETE_INTERVAL = 1.2  # seconds between single deletes; stays under the per-channel rate limit
+PURGE_PROGRESS_INTERVAL = 5   # seconds between progress edits
+INTERACTION_EDIT_WINDOW = timedelta(minutes=14)  # interaction tokens expire after 15 minutes
+
+class PurgeJob:
+    def __init__(
+        self,
+        job_id: int,
+        channel: discord.TextChannel,
+        requested_by: discord.abc.User,
+        author: discord.abc.User | None,
+        contains: str | None,
+        before: datetime.datetime | None,
+        after: datetime.datetime | None,
+        limit: int | None,
+        include_pinned: bool,
+    ):
+        self.id = job_id
+        self.channel = channel
+        self.requested_by = requested_by
+        self.author = author
+        self.contains = contains.lower() if contains else None
+        self.before = before
+        self.after = after
+        self.limit = limit
+        self.include_pinned = include_pinned
+        self.started_at = discord.utils.utcnow()
+        self.status = "running"
+        self.error: str | None = None
+        self.scanned = 0
+        self.matched = 0
+        self.bulk_deleted = 0
+        self.single_deleted = 0
+        self.failed = 0
+        self.task: asyncio.Task | None = None
+
+    def matches(self, msg: discord.Message) -> bool:
+        if msg.pinned and not self.include_pinned:
+            return False
+        if self.author and msg.author.id != self.author.id:
+            return False
+        if self.contains and self.contains not in msg.content.lower():
+            return False
+        return True
+
+    def summary(self) -> str:
+        return (f"Purge #{self.id} in {self.channel.mention}: **{self.status}**\n"
+                f"Scanned {self.scanned}, matched {self.matched}, deleted {self.bulk_deleted + self.single_deleted} "
+                f"({self.bulk_deleted} bulk, {self.single_deleted} single), failed {self.failed}."
+                + (f"\nError: {self.error}" if self.error else ""))
+
+    async def run(self):
+        old_messages: asyncio.Queue[discord.Message | None] = asyncio.Queue(maxsize=500)
+        single_lane = asyncio.create_task(self._single_delete_lane(old_messages))
+        batch: list[discord.Message] = []
+        try:
+            async for msg in self.channel.history(limit=None, before=self.before, after=self.after):
+                self.scanned += 1
+                await work_scheduler.checkpoint(self.scanned)
+                if not self.matches(msg):
+                    continue
+                self.matched += 1
+                if discord.utils.utcnow() - msg.created_at < BULK_DELETE_MAX_AGE:
+                    batch.append(msg)
+                    if len(batch) == 100:
+                        await self._bulk_delete(batch)
+                        batch = []
+                else:
+                    await self._enqueue_single(old_messages, single_lane, msg)
+                if self.limit and self.matched >= self.limit:
+                    break
+            if batch:
+                await self._bulk_delete(batch)
+            await self._enqueue_single(old_messages, single_lane, None)
+            await single_lane
+            self.status = "done"
+        except asyncio.CancelledError:
+            self.status = "cancelled"
+            single_lane.cancel()
+            raise
+        except discord.Forbidden:
+            self.status = "failed"
+            self.error = "Missing 'Manage Messages' or 'Read Message History' permission."
+            single_lane.cancel()
+        except Exception as e:
+            self.status = "failed"
+            self.error = str(e)
+            single_lane.cancel()
+        finally:
+            log.info(f"CMD_PURGE: Purge #{self.id} in #{self.channel.name} {self.status}. "
+                     f"Deleted {self.bulk_deleted + self.single_deleted} of {self.matched} matched ({self.scanned} scanned).")
+
+    async def _bulk_delete(self, batch: list[discord.Message]):
+        try:
+            if len(batch) == 1:
+                await batch[0].delete()
+            else:
+                await self.channel.delete_messages(batch)
+            self.bulk_deleted += len(batch)
+        except discord.Forbidden:
+            raise  # no permission means every later delete fails too; stop the job
+        except discord.NotFound:
+            # Someone else deleted one of them first; fall back to deleting the rest one by one.
+            for msg in batch:
+                try:
+                    await msg.delete()
+                    self.bulk_deleted += 1
+                except discord.NotFound:
+                    pass
+        except discord.HTTPException as e:
+            self.failed += len(batch)
+            log.warning(f"CMD_PURGE: Bulk delete of {len(batch)} messages failed in #{self.channel.name}: {e}")
+
+    async def _enqueue_single(self, queue: asyncio.Queue, lane: asyncio.Task, msg: discord.Message | None):
+        """Hand a message to the single-delete lane, re-raising its error if the lane has stopped."""
+        while True:
+            if lane.done():
+                lane.result()
+                return
+            try:
+                queue.put_nowait(msg)
+                return
+            except asyncio.QueueFull:
+                await asyncio.wait([lane], timeout=SINGLE_DELETE_INTERVAL)
+
+    async def _single_delete_lane(self, queue: asyncio.Queue):
+        while (msg := await queue.get()) is not None:
+            try:
+                await msg.delete()
+                self.single_deleted += 1
+            except discord.NotFound:
+                pass
+            except discord.Forbidden:
+                raise
+            except discord.HTTPException as e:
+                self.failed += 1
+                log.warning(f"CMD_PURGE: Could not delete message {msg.id} in #{self.channel.name}: {e}")
+            await asyncio.sleep(SINGLE_DELETE_INTERVAL)
+
+
+async def report_purge_progress(job: PurgeJob, interaction: discord.Interaction):
+    """Edit the invoking interaction's reply with progress until the job ends or the token expires."""
+    while job.status == "running" and discord.utils.utcnow() - job.started_at < INTERACTION_EDIT_WINDOW:
+        try:
+            await interaction.edit_original_response(content=job.summary())
+        except discord.HTTPException:
+            return
+        await asyncio.sleep(PURGE_PROGRESS_INTERVAL)
+    if discord.utils.utcnow() - job.started_at < INTERACTION_EDIT_WINDOW:
+        try:
+            await interaction.edit_original_response(content=job.summary())
+        except discord.HTTPException:
+            pass
+
+@app_commands.command(name='purge', description='(Owner Only) Clears any number of messages in the background, with filters.')
+@app_commands.default_permissions(manage_guild=False)
+@app_commands.describe(
+    channel='Channel to clean (defaults to the current channel).',
+    author='Only delete messages from this user.',
+    contains='Only delete messages containing this text.',
+    older_than_days='Only delete messages at least this many days old.',
+    newer_than_days='Only delete messages at most this many days old.',
+    limit='Stop after this many matching messages (default: no limit).',
+    include_pinned='Also delete pinned messages.'
+)
+@app_commands.check(is_co_owner)
+@app_commands.guild_only()
+async def purge(
+    interaction: discord.Interaction,
+    channel: discord.TextChannel = None,
+    author: discord.User = None,
+    contains: str = None,
+    older_than_days: int = 0,
+    newer_than_days: int = None,
+    limit: int = None,
+    include_pinned: bool = False
+):
+    await interaction.response.defer(ephemeral=True)
+    target_channel = channel or interaction.channel
+    now = discord.utils.utcnow()
+
+    if older_than_days < 0 or (newer_than_days is not None and newer_than_days <= older_than_days) or (limit is not None and limit <= 0):
+        await interaction.followup.send("Invalid filters: check the day range and limit.", ephemeral=True)
+        return
+
+    job = PurgeJob(
+        next(market.purge_ids), target_channel, interaction.user, author, contains,
+        before=now - timedelta(days=older_than_days) if older_than_days else None,
+        after=now - timedelta(days=newer_than_days) if newer_than_days is not None else None,
+        limit=limit,
+        include_pinned=include_pinned,
+    )
+    market.purge_jobs[job.id] = job
+    # Forget the oldest finished jobs; running ones stay listed so they can still be inspected and cancelled.
+    finished = [old.id for old in market.purge_jobs.values() if old.status != "running"]
+    for old_id in finished[:max(0, len(market.purge_jobs) - MAX_TRACKED_JOBS)]:
+        del market.purge_jobs[old_id]
+    job.task = spawn(job.run(), "purge")
+
+    await interaction.followup.send(f"🧹 Purge **#{job.id}** started in {target_channel.mention}. Use `/purgecancel {job.id}` to stop it.", ephemeral=True)
+    spawn(report_purge_progress(job, interaction), "purge_progress")
+    log.info(f"CMD_PURGE: Purge #{job.id} started in #{target_channel.name} by {interaction.user.display_name}.")
+
+@app_commands.command(name='purgestatus', description='(Owner Only) Shows progress of purge jobs.')
+@app_commands.default_permissions(manage_guild=False)
+@app_commands.describe(job_id='The purge to inspect. Leave empty to list recent purges.')
+@app_commands.check(is_co_owner)
+async def purge_status(interaction: discord.Interaction, job_id: int = None):
+    selected = [market.purge_jobs[job_id]] if job_id in market.purge_jobs else ([] if job_id else list(reversed(market.purge_jobs.values()))[:5])
+    if not selected:
+        await interaction.response.send_message("No matching purge jobs.", ephemeral=True)
+        return
+    await interaction.response.send_message("\n\n".join(job.summary() for job in selected), ephemeral=True)
+
+@app_commands.command(name='purgecancel', description='(Owner Only) Stops a running purge job.')
+@app_commands.default_permissions(manage_guild=False)
+@app_commands.describe(job_id='The purge to stop.')
+@app_commands.check(is_co_owner)
+async def purge_cancel(interaction: discord.Interaction, job_id: int):
+    job = market.purge_jobs.get(job_id)
+    if job is None or job.task is None or job.task.done():
+        await interaction.response.send_message(f"Purge #{job_id} is not running.", ephemeral=True)
+        return
+    job.task.cancel()
+    await interaction.response.send_message(f"✅ Purge #{job_id} cancelled.", ephemeral=True)
+    log.info(f"CMD_PURGE: Purge #{job_id} cancelled by {interaction.user.display_name}.")
+
+# ────────────────────────── lockdown ───────────────────────────────
+# Before any lockdown touches a channel, its current @everyone overwrite is written to
+# shard.data["lockdown_snapshots"] as {channel_id: [allow, deny]} (null when there was no
+# overwrite) and saved, so unlocking puts back exactly what was there, even after a restart.
+LOCKDOWN_WORKERS = 5
+LOCKDOWN_MAX_ATTEMPTS = 3
+LOCKDOWN_DENY = {
+    "send_messages": False,
+    "send_messages_in_threads": False,
+    "create_public_threads": False,
+    "create_private_threads": False,
+    "add_reactions": False,
+}
+
+def lockdown_snapshots(shard: MarketShard) -> dict[str, list[int] | None]:
+    return shard.data.setdefault("lockdown_snapshots", {})
+
+def snapshot_overwrite(channel: discord.abc.GuildChannel) -> list[int] | None:
+    overwrite = channel.overwrites.get(channel.guild.default_role)
+    if overwrite is None:
+        return None
+    allow, deny = overwrite.pair()
+    return [allow.value, deny.value]
+
+def restore_overwrite(snapshot: list[int] | None) -> discord.PermissionOverwrite | None:
+    if snapshot is None:
+        return None
+    return discord.PermissionOverwrite.from_pair(discord.Permissions(snapshot[0]), discord.Permissions(snapshot[1]))
+
+def locked_overwrite(channel: discord.abc.GuildChannel) -> discord.PermissionOverwrite:
+    overwrite = channel.overwrites_for(channel.guild.default_role)
+    overwrite.update(**LOCKDOWN_DENY)
+    return overwrite
+
+def lockdown_scope(guild: discord.Guild, category: discord.CategoryChannel | None) -> list[discord.abc.GuildChannel]:
+    channels = category.channels if category else guild.channels
+    return [ch for ch in channels if not isinstance(ch, discord.CategoryChannel)]
+
+async def apply_overwrites(
+    guild: discord.Guild,
+    plan: dict[int, discord.PermissionOverwrite | None],
+    reason: str,
+) -> tuple[list[int], list[int]]:
+    """Set the @everyone overwrite on every channel in `plan` with a small worker pool. Returns (done, failed) channel ids."""
+    queue: asyncio.Queue[tuple[int, discord.PermissionOverwrite | None]] = asyncio.Queue()
+    for item in plan.items():
+        queue.put_nowait(item)
+    done: list[int] = []
+    failed: list[int] = []
+
+    async def worker():
+        while not queue.empty():
+            channel_id, overwrite = queue.get_nowait()
+            channel = guild.get_channel(channel_id)
+            if channel is None:
+                done.append(channel_id)  # Channel was deleted; nothing left to change.
+                continue
+            for attempt in range(LOCKDOWN_MAX_ATTEMPTS):
+                try:
+                    await channel.set_permissions(guild.default_role, overwrite=overwrite, reason=reason)
+                    done.append(channel_id)
+                    break
+                except discord.Forbidden:
+                    failed.append(channel_id)
+                    break
+                except discord.HTTPException as e:
+                    # discord.py already waits out 429s per route; back off further on repeated
+                    # rate limits and transient server errors, give up on anything else.
+                    if e.status != 429 and e.status < 500:
+                        failed.append(channel_id)
+                        break
+                    log.warning(f"CMD_LOCK: Overwrite update for #{channel.name} failed ({e.status}), attempt {attempt + 1}/{LOCKDOWN_MAX_ATTEMPTS}.")
+                    await asyncio.sleep(2 ** attempt)
+                except Exception as e:
+                    # Anything else (connection errors, timeouts) fails just this channel, not the worker,
+                    # so every channel ends up in done or failed and the caller's snapshots stay accurate.
+                    log.error(f"CMD_LOCK: Overwrite update for #{channel.name} failed: {e}")
+                    failed.append(channel_id)
+                    break
+            else:
+                failed.append(channel_id)
+
+    await asyncio.gather(*(worker() for _ in range(min(LOCKDOWN_WORKERS, len(plan)))))
+    return done, failed
+
+async def drop_snapshots(shard: MarketShard, channel_ids: list[int]):
+    """Forget snapshots of channels a lockdown never changed, in memory and on disk."""
+    snapshots = lockdown_snapshots(shard)
+    for channel_id in channel_ids:
+        snapshots.pop(str(channel_id), None)
+    await save_data(shard)
+
+async def announce_lockdown(shard: MarketShard, message: str):
+    channel_id = shard.setting("announcement_channel_id")
+    channel = bot.get_channel(channel_id) if channel_id else None
+    if channel:
+        try:
+            await channel.send(message)
+        except discord.HTTPException as e:
+            log.warning(f"CMD_LOCK: Could not post lockdown notice in guild {shard.guild_id}: {e}")
+
+@app_commands.command(name='lockdown', description='(Owner Only) Locks down the current channel or a specified channel.')
+@app_commands.default_permissions(manage_guild=False)
+@app_commands.describe(channel='The channel to lock down (defaults to current channel).')
+@app_commands.check(is_co_owner)
+@app_commands.guild_only()
+async def lockdown(interaction: discord.Interaction, channel: discord.TextChannel = None):
+    await interaction.response.defer(ephemeral=True)
+    shard = interaction_shard(interaction)
+    target_channel = channel or interaction.channel
+
+    current_overwrites = target_channel.overwrites_for(interaction.guild.default_role)
+    if current_overwrites.send_messages is False:
+        await interaction.followup.send(f"{target_channel.mention} is already locked down.", ephemeral=True)
+        return
+
+    snapshots = lockdown_snapshots(shard)
+    new_snapshot = str(target_channel.id) not in snapshots
+    locked = False
+    try:
+        snapshots.setdefault(str(target_channel.id), snapshot_overwrite(target_channel))
+        await save_data(shard)
+        await target_channel.set_permissions(interaction.guild.default_role, send_messages=False)
+        locked = True
+        await target_channel.send(f"🔒 This channel has been locked down by {interaction.user.mention}. Only staff can send messages.")
+        await interaction.followup.send(f"Successfully locked down {target_channel.mention}.", ephemeral=True)
+        log.info(f"CMD_LOCK: Locked down #{target_channel.name} by {interaction.user.display_name}.")
+    except discord.Forbidden:
+        if locked:
+            await interaction.followup.send(f"Locked down {target_channel.mention}, but I could not post the notice there.", ephemeral=True)
+            log.warning(f"CMD_LOCK: Locked down #{target_channel.name} but could not post the lockdown notice.")
+            return
+        await interaction.followup.send(
+            "I do not have permission to manage channels. Please ensure I have 'Manage Channels' permission and my role is higher than `@everyone`.",
+            ephemeral=True
+        )
+        log.error(f"CMD_LOCK: Bot lacks 'Manage Channels' permission to lockdown #{target_channel.name}.")
+    except Exception as e:
+        await interaction.followup.send(f"An unexpected error occurred: {e}", ephemeral=True)
+        log.error(f"CMD_LOCK: Error locking down #{target_channel.name}: {e}")
+    if new_snapshot and not locked:
+        await drop_snapshots(shard, [target_channel.id])
+
+@app_commands.command(name='unlock', description='(Owner Only) Unlocks the current channel or a specified channel.')
+@app_commands.default_permissions(manage_guild=False)
+@app_commands.describe(channel='The channel to unlock (defaults to current channel).')
+@app_commands.check(is_co_owner)
+@app_commands.guild_only()
+async def unlock(interaction: discord.Interaction, channel: discord.TextChannel = None):
+    await interaction.response.defer(ephemeral=True)
+    shard = interaction_shard(interaction)
+    target_channel = channel or interaction.channel
+    snapshots = lockdown_snapshots(shard)
+    key = str(target_channel.id)
+
+    current_overwrites = target_channel.overwrites_for(interaction.guild.default_role)
+    if current_overwrites.send_messages is not False and key not in snapshots:
+        await interaction.followup.send(f"{target_channel.mention} is not currently locked down.", ephemeral=True)
+        return
+
+    try:
+        if key in snapshots:
+            await target_channel.set_permissions(interaction.guild.default_role, overwrite=restore_overwrite(snapshots[key]))
+            del snapshots[key]
+            await save_data(shard)
+        else:
+            # Locked before snapshots existed; the best we can do is clear the deny.
+            await target_channel.set_permissions(interaction.guild.default_role, send_messages=None)
+        await target_channel.send(f"🔓 This channel has been unlocked by {interaction.user.mention}. Members can now send messages.")
+        await interaction.followup.send(f"Successfully unlocked {target_channel.mention}.", ephemeral=True)
+        log.info(f"CMD_UNLOCK: Unlocked #{target_channel.name} by {interaction.user.display_name}.")
+    except discord.Forbidden:
+        await interaction.followup.send(
+            "I do not have permission to manage channels. Please ensure I have 'Manage Channels' permission and my role is higher than `@everyone`.",
+            ephemeral=True
+        )
+        log.error(f"CMD_UNLOCK: Bot lacks 'Manage Channels' permission to unlock #{target_channel.name}.")
+    except Exception as e:
+        await interaction.followup.send(f"An unexpected error occurred: {e}", ephemeral=True)
+        log.error(f"CMD_UNLOCK: Error unlocking #{target_channel.name}: {e}")
+
+@app_commands.command(name='serverlockdown', description='(Owner Only) Locks every channel in the server or in one category.')
+@app_commands.default_permissions(manage_guild=False)
+@app_commands.describe(category='Only lock channels in this category (defaults to the whole server).')
+@app_commands.check(is_co_owner)
+@app_commands.guild_only()
+async def server_lockdown(interaction: discord.Interaction, category: discord.CategoryChannel = None):
+    await interaction.response.defer(ephemeral=True)
+    shard = interaction_shard(interaction)
+    guild = interaction.guild
+    snapshots = lockdown_snapshots(shard)
+
+    # Channels that already have a snapshot are locked; re-snapshotting them would capture the locked state.
+    targets = [ch for ch in lockdown_scope(guild, category) if str(ch.id) not in snapshots]
+    if not targets:
+        await interaction.followup.send("Every channel in that scope is already locked down.", ephemeral=True)
+        return
+
+    for ch in targets:
+        snapshots[str(ch.id)] = snapshot_overwrite(ch)
+    await save_data(shard)
+
+    scope_name = f"category **{category.name}**" if category else "the server"
+    reason = f"Lockdown by {interaction.user} ({interaction.user.id})"
+    done, failed = await apply_overwrites(guild, {ch.id: locked_overwrite(ch) for ch in targets}, reason)
+
+    if failed:
+        # These channels were never changed, so their snapshots are not needed for restore.
+        await drop_snapshots(shard, failed)
+
+    await announce_lockdown(shard, f"🔒 {scope_name[0].upper() + scope_name[1:]} has been locked down by {interaction.user.mention}. Only staff can send messages.")
+    await interaction.followup.send(
+        f"Locked {len(done)} channel(s) in {scope_name}." + (f" Failed to lock {len(failed)} channel(s); check my permissions there." if failed else ""),
+        ephemeral=True
+    )
+    log.info(f"CMD_LOCK: Server lockdown of {scope_name} by {interaction.user.display_name}: {len(done)} locked, {len(failed)} failed.")
+
+@app_commands.command(name='serverunlock', description='(Owner Only) Restores the permissions saved by lockdowns.')
+@app_commands.default_permissions(manage_guild=False)
+@app_commands.describe(category='Only restore channels in this category (defaults to every locked channel).')
+@app_commands.check(is_co_owner)
+@app_commands.guild_only()
+async def server_unlock(interaction: discord.Interaction, category: discord.CategoryChannel = None):
+    await interaction.response.defer(ephemeral=True)
+    shard = interaction_shard(interaction)
+    guild = interaction.guild
+    snapshots = lockdown_snapshots(shard)
+
+    if category:
+        in_scope = {str(ch.id) for ch in lockdown_scope(guild, category)}
+        plan_keys = [key for key in snapshots if key in in_scope]
+    else:
+        plan_keys = list(snapshots)
+    if not plan_keys:
+        await interaction.followup.send("There are no locked channels to restore.", ephemeral=True)
+        return
+
+    reason = f"Unlock by {interaction.user} ({interaction.user.id})"
+    done, failed = await apply_overwrites(guild, {int(key): restore_overwrite(snapshots[key]) for key in plan_keys}, reason)
+
+    # Failed channels keep their snapshot so a second /serverunlock can retry them.
+    for channel_id in done:
+        snapshots.pop(str(channel_id), None)
+    await save_data(shard)
+
+    scope_name = f"category **{category.name}**" if category else "the server"
+    await announce_lockdown(shard, f"🔓 {scope_name[0].upper() + scope_name[1:]} has been unlocked by {interaction.user.mention}.")
+    await interaction.followup.send(
+        f"Restored {len(done)} channel(s)." + (f" {len(failed)} channel(s) could not be restored; run the command again to retry." if failed else ""),
+        ephemeral=True
+    )
+    log.info(f"CMD_UNLOCK: Server unlock of {scope_name} by {interaction.user.display_name}: {len(done)} restored, {len(failed)} failed.")
+
+# ────────────────────────── announcements ──────────────────────────
+@app_commands.command(name='announce', description='(Owner) Make the bot announce something to the channel.')
+@app_commands.default_permissions(manage_guild=False)
+@app_commands.describe(message='The message for the bot to announce.')
+@app_commands.check(is_co_owner)
+async def announce(interaction: discord.Interaction, message: str):
+    await interaction.response.defer(ephemeral=True)
+    try:
+        await interaction.channel.send(message)
+        await interaction.followup.send("✅ Announcement sent.", ephemeral=True)
+        log.info(f"CMD_ANNOUNCE: Announcement sent by {interaction.user.display_name}: {message}")
+    except Exception as e:
+        await interaction.followup.send(f"❌ Error sending announcement: {e}", ephemeral=True)
+        log.error(f"CMD_ANNOUNCE: Error sending announcement: {e}")
+
+@app_commands.command(name='datedannounce', description='(Owner) Make the bot announce something with a date.')
+@app_commands.default_permissions(manage_guild=False)
+@app_commands.describe(
+    message='The message for the bot to announce.',
+    day_offset='Optional: Days from now for the date (e.g., 3 for 3 days from now). Defaults to today.',
+    time_style='Optional: How to display the time (t, T, d, D, f, F, R). Defaults to F (Full Date/Time).'
+)
+@app_commands.choices(time_style=[
+    app_commands.Choice(name='Short Time (16:20)', value='t'),
+    app_commands.Choice(name='Long Time (16:20:30)', value='T'),
+    app_commands.Choice(name='Short Date (14/03/2023)', value='d'),
+    app_commands.Choice(name='Long Date (14 March 2023)', value='D'),
+    app_commands.Choice(name='Short Date/Time (14 March 2023 16:20)', value='f'),
+    app_commands.Choice(name='Full Date/Time (Tuesday, 14 March 2023 16:20)', value='F'),
+    app_commands.Choice(name='Relative Time (2 months ago)', value='R')
+])
+@app_commands.check(is_co_owner)
+async def dated_announce(
+    interaction: discord.Interaction,
+    message: str,
+    day_offset: int = 0,
+    time_style: app_commands.Choice[str] = None
+):
+    await interaction.response.defer(ephemeral=True)
+    
+    try:
+        target_time = discord.utils.utcnow() + datetime.timedelta(days=day_offset)
+        unix_timestamp = int(target_time.timestamp())
+        style = time_style.value if time_style else 'F'
+        date_string = f"<t:{unix_timestamp}:{style}>"
+        full_announcement = f"{message}\n\nDate: {date_string}"
+        await interaction.channel.send(full_announcement)
+        
+        await interaction.followup.send(f"✅ Dated announcement sent: {full_announcement}", ephemeral=True)
+        log.info(f"CMD_DATEDANNOUNCE: Dated announcement sent by {interaction.user.display_name}: {full_announcement}")
+    except Exception as e:
+        await interaction.followup.send(f"❌ Error sending dated announcement: {e}", ephemeral=True)
+        log.error(f"CMD_DATEDANNOUNCE: Error sending dated announcement: {e}")
+
+@app_commands.command(name='scheduleannounce', description='(Owner) Schedule an announcement, optionally repeating.')
+@app_commands.default_permissions(manage_guild=False)
+@app_commands.describe(
+    message='The message for the bot to announce.',
+    days='Days from now.',
+    hours='Hours from now.',
+    minutes='Minutes from now.',
+    repeat_hours='Optional: repeat every N hours (0 = send once).',
+    channel='Channel to post in (defaults to the current channel).'
+)
+@app_commands.check(is_co_owner)
+@app_commands.guild_only()
+async def schedule_announce(
+    interaction: discord.Interaction,
+    message: str,
+    days: int = 0,
+    hours: int = 0,
+    minutes: int = 0,
+    repeat_hours: int = 0,
+    channel: discord.TextChannel = None
+):
+    await interaction.response.defer(ephemeral=True)
+    shard = interaction_shard(interaction)
+    target_channel = channel or interaction.channel
+
+    if min(days, hours, minutes, repeat_hours) < 0:
+        await interaction.followup.send("Offsets and repeat interval cannot be negative.", ephemeral=True)
+        return
+
+    due = discord.utils.utcnow() + timedelta(days=days, hours=hours, minutes=minutes)
+    ann_id = announcement_dispatcher.schedule(
+        shard, target_channel.id, message, due, repeat_hours * 3600 or None, interaction.user.id
+    )
+    await save_data(shard)
+
+    repeat_note = f", repeating every {repeat_hours}h" if repeat_hours else ""
+    await interaction.followup.send(f"✅ Announcement **#{ann_id}** scheduled for <t:{int(due.timestamp())}:F> in {target_channel.mention}{repeat_note}.", ephemeral=True)
+    log.info(f"CMD_SCHEDULEANNOUNCE: #{ann_id} scheduled for {due.isoformat()} in #{target_channel.name} by {interaction.user.display_name}.")
+
+@app_commands.command(name='announcements', description='(Owner) Lists this server\'s pending scheduled announcements.')
+@app_commands.default_permissions(manage_guild=False)
+@app_commands.check(is_co_owner)
+@app_commands.guild_only()
+async def list_announcements(interaction: discord.Interaction):
+    entries = interaction_shard(interaction).data.get("announcements", {})
+    ordered = sorted(entries.items(), key=lambda kv: kv[1]["due"])
+    lines = []
+    for ann_id, entry in ordered[:20]:
+        due = int(datetime.datetime.fromisoformat(entry["due"]).timestamp())
+        repeat = f" (every {entry['repeat_seconds'] // 3600}h)" if entry.get("repeat_seconds") else ""
+        lines.append(f"**#{ann_id}** <t:{due}:R> in <#{entry['channel_id']}>{repeat}: {entry['message'][:60]}")
+    more = f"\n…and {len(ordered) - 20} more." if len(ordered) > 20 else ""
+    await interaction.response.send_message("\n".join(lines) + more if lines else "No scheduled announcements.", ephemeral=True)
+
+@app_commands.command(name='cancelannouncement', description='(Owner) Cancels a scheduled announcement.')
+@app_commands.default_permissions(manage_guild=False)
+@app_commands.describe(announcement_id='The announcement number shown by /announcements.')
+@app_commands.check(is_co_owner)
+@app_commands.guild_only()
+async def cancel_announcement(interaction: discord.Interaction, announcement_id: int):
+    await interaction.response.defer(ephemeral=True)
+    shard = interaction_shard(interaction)
+
+    # The stale wheel entry is skipped when it pops, since the shard no longer has it.
+    if shard.data.get("announcements", {}).pop(str(announcement_id), None) is None:
+        await interaction.followup.send(f"No scheduled announcement #{announcement_id}.", ephemeral=True)
+        return
+    await save_data(shard)
+    await interaction.followup.send(f"✅ Announcement #{announcement_id} cancelled.", ephemeral=True)
+    log.info(f"CMD_CANCELANNOUNCEMENT: #{announcement_id} cancelled in guild {shard.guild_id} by {interaction.user.display_name}.")
+
+async def setup(bot: commands.Bot):
+    register_commands(bot, globals())
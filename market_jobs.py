@@ -0,0 +1,276 @@
+import csv
+import io
+import json
+import pickle
+import random
+import zlib
+from typing import Any, Iterable, Iterator
+
+# CPU-heavy work that runs in the bot's process pool. Everything here is pure: jobs receive a
+# pickled snapshot of one guild's market state (bytes, taken on the event loop) and return plain
+# picklable results. Nothing in this module may import discord or touch bot state.
+
+def load_snapshot(snapshot: bytes) -> dict[str, Any]:
+    return pickle.loads(snapshot)
+
+def dump_json(snapshot: bytes) -> bytes:
+    return json.dumps(load_snapshot(snapshot), indent=4, default=str).encode()
+
+def net_worths(data: dict[str, Any]) -> list[tuple[str, float, float, float]]:
+    """(user_id, cash, holdings value, net worth) for every user in the snapshot."""
+    prices = {name: coin["price"] for name, coin in data.get("coins", {}).items()}
+    rows = []
+    for uid, user in data.get("users", {}).items():
+        cash = float(user.get("balance", 0.0))
+        holdings = sum(qty * prices.get(coin, 0.0) for coin, qty in user.get("portfolio", {}).items())
+        rows.append((uid, cash, holdings, cash + holdings))
+    return rows
+
+def conversion_preview(snapshot: bytes, coin_name: str) -> dict[str, Any]:
+    data = load_snapshot(snapshot)
+    coin_price = data.get("coins", {}).get(coin_name, {}).get("price", 0.0)
+    payouts = [
+        user["portfolio"][coin_name] * coin_price
+        for user in data.get("users", {}).values()
+        if user.get("portfolio", {}).get(coin_name, 0.0) > 0.0
+    ]
+    return {
+        "price": coin_price,
+        "holders": len(payouts),
+        "total_payout": round(sum(payouts), 2),
+        "largest_payout": round(max(payouts, default=0.0), 2),
+    }
+
+def step_price(price: float, rng: random.Random, volatility_levels: list[float], min_price: float, max_price: float) -> float:
+    """One scheduled price update; mirrors bot.update_prices()."""
+    chosen_volatility = rng.choice(volatility_levels)
+    new_price = price * (1 + rng.uniform(-chosen_volatility, chosen_volatility))
+    return round(max(min_price, min(max_price, new_price)), 2)
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+def simulate_prices(
+    start_price: float,
+    steps: int,
+    runs: int,
+    volatility_levels: list[float],
+    min_price: float,
+    max_price: float,
+    seed: int | None = None,
+) -> dict[str, Any]:
+    """Monte Carlo of `steps` future price updates, `runs` times. Returns the final-price distribution."""
+    rng = random.Random(seed)
+    finals = []
+    for _ in range(runs):
+        p = start_price
+        for _ in range(steps):
+            p = step_price(p, rng, volatility_levels, min_price, max_price)
+        finals.append(p)
+    finals.sort()
+    return {
+        "start_price": start_price,
+        "steps": steps,
+        "runs": runs,
+        "mean": round(sum(finals) / len(finals), 2) if finals else 0.0,
+        "p05": percentile(finals, 0.05),
+        "p50": percentile(finals, 0.50),
+        "p95": percentile(finals, 0.95),
+        "min": finals[0] if finals else 0.0,
+        "max": finals[-1] if finals else 0.0,
+    }
+
+def encode_rows(rows: Iterable[dict[str, Any]], fmt: str, columns: list[str]) -> Iterator[bytes]:
+    """One encoded line per row: CSV (without header) or NDJSON."""
+    if fmt == "ndjson":
+        for row in rows:
+            yield (json.dumps(row, default=str) + "\n").encode()
+        return
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, columns, extrasaction="ignore")
+    for row in rows:
+        writer.writerow(row)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+
+def csv_header(columns: list[str]) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(columns)
+    return buffer.getvalue().encode()
+
+GZIP_CHECK_EVERY = 64 * 1024      # raw bytes between size checks
+GZIP_SIZE_MARGIN = 256 * 1024     # room left for what the compressor still buffers
+
+def gzip_parts(lines: Iterable[bytes], max_bytes: int, header: bytes = b"") -> Iterator[bytes]:
+    """Gzip a stream of lines into standalone parts of at most max_bytes each, each starting with header.
+
+    Only the part being built is held in memory, so memory stays flat however long the stream is.
+    """
+    def new_part():
+        compressor = zlib.compressobj(wbits=31)
+        return compressor, [compressor.compress(header)] if header else [], 0
+
+    compressor, chunks, size = new_part()
+    pending = len(header)
+    has_rows = False
+    for line in lines:
+        chunks.append(compressor.compress(line))
+        pending += len(line)
+        has_rows = True
+        if pending >= GZIP_CHECK_EVERY:
+            chunks.append(compressor.flush(zlib.Z_SYNC_FLUSH))
+            size = sum(len(c) for c in chunks)
+            pending = 0
+            if size >= max_bytes - GZIP_SIZE_MARGIN:
+                chunks.append(compressor.flush())
+                yield b"".join(chunks)
+                compressor, chunks, size = new_part()
+                pending = len(header)
+                has_rows = False
+    if has_rows:
+        chunks.append(compressor.flush())
+        yield b"".join(chunks)
+
+def gini(values: list[float]) -> float:
+    values = sorted(max(0.0, v) for v in values)
+    total = sum(values)
+    if not values or total == 0:
+        return 0.0
+    weighted = sum((i + 1) * v for i, v in enumerate(values))
+    return round((2 * weighted) / (len(values) * total) - (len(values) + 1) / len(values), 4)
+
+def wealth_summary(data: dict[str, Any]) -> dict[str, Any]:
+    worths = sorted(row[3] for row in net_worths(data))
+    top = worths[-max(1, len(worths) // 10):] if worths else []
+    return {
+        "users": len(worths),
+        "p10": round(percentile(worths, 0.10), 2),
+        "p50": round(percentile(worths, 0.50), 2),
+        "p90": round(percentile(worths, 0.90), 2),
+        "gini": gini(worths),
+        "top10_share": round(sum(top) / sum(worths), 4) if worths and sum(worths) > 0 else 0.0,
+    }
+
+def replay_market(
+    data: dict[str, Any],
+    trades: list[dict[str, Any]],
+    start: float,
+    end: float,
+    policy: dict[str, Any],
+    seed: int | None = None,
+) -> dict[str, Any]:
+    """Replay recorded ledger events on top of `data` under an alternative market policy.
+
+    `data` is the market state at `start` (unix seconds) and is modified in place; `trades` are the
+    events recorded after it (see bot.record_trade). Price updates and conversions follow the
+    policy's cadence instead of what happened live. Trades keep their intent (cash spent on a buy,
+    quantity sold) and are skipped when the replayed state can't honour them.
+    """
+    rng = random.Random(seed)
+    coins, users = data["coins"], data["users"]
+    convert_coin = policy["conversion_coin"]
+
+    def user(uid: str) -> dict[str, Any]:
+        return users.setdefault(uid, {"balance": 0.0, "portfolio": {}, "on_buy_cooldown": False})
+
+    events: list[tuple[float, int, str, dict[str, Any] | None]] = []
+    t = start + policy["price_interval_hours"] * 3600
+    while t <= end:
+        events.append((t, 0, "price", None))
+        t += policy["price_interval_hours"] * 3600
+    t = start + policy["conversion_interval_hours"] * 3600
+    while t <= end:
+        events.append((t, 1, "conversion", None))
+        t += policy["conversion_interval_hours"] * 3600
+    events.extend((trade["ts"], 2, "trade", trade) for trade in trades if start <= trade["ts"] <= end)
+    events.sort(key=lambda e: (e[0], e[1]))
+
+    price_path = [coins[convert_coin]["price"]] if convert_coin in coins else []
+    payouts: list[float] = []
+    executed = skipped = 0
+
+    for _, _, kind, trade in events:
+        if kind == "price":
+            for coin in coins.values():
+                coin["price"] = step_price(coin["price"], rng, policy["volatility_levels"], policy["min_price"], policy["max_price"])
+            for u in users.values():
+                u["on_buy_cooldown"] = False
+            if convert_coin in coins:
+                price_path.append(coins[convert_coin]["price"])
+        elif kind == "conversion":
+            price = coins.get(convert_coin, {}).get("price", 0.0)
+            total = 0.0
+            for u in users.values():
+                qty = u.get("portfolio", {}).pop(convert_coin, 0.0)
+                if qty > 0:
+                    u["balance"] += qty * price
+                    total += qty * price
+                    if policy["cooldown_after_conversion"]:
+                        u["on_buy_cooldown"] = True
+            payouts.append(round(total, 2))
+        else:
+            u = user(trade["user"])
+            coin, action = trade.get("coin"), trade["action"]
+            price = coins.get(coin, {}).get("price", 0.0) if coin else 0.0
+            if action == "buy":
+                qty = round(trade["cash"] / price, 3) if price else 0.0
+                cost = qty * price
+                if qty <= 0 or u.get("on_buy_cooldown") or u["balance"] < cost:
+                    skipped += 1
+                    continue
+                u["balance"] -= cost
+                u["portfolio"][coin] = u["portfolio"].get(coin, 0.0) + qty
+            elif action == "sell":
+                qty = min(trade["qty"], u["portfolio"].get(coin, 0.0))
+                if qty <= 0:
+                    skipped += 1
+                    continue
+                u["balance"] += qty * price
+                u["portfolio"][coin] -= qty
+                if u["portfolio"][coin] <= 0.0001:
+                    del u["portfolio"][coin]
+            elif action == "transfer":
+                target = user(trade["to"])
+                if coin:
+                    qty = min(trade["qty"], u["portfolio"].get(coin, 0.0))
+                    if qty <= 0:
+                        skipped += 1
+                        continue
+                    u["portfolio"][coin] -= qty
+                    target["portfolio"][coin] = target["portfolio"].get(coin, 0.0) + qty
+                else:
+                    amount = min(trade["cash"], u["balance"])
+                    u["balance"] -= amount
+                    target["balance"] += amount
+            else:  # adjust
+                if coin:
+                    u["portfolio"][coin] = max(0.0, u["portfolio"].get(coin, 0.0) + trade["qty"])
+                else:
+                    u["balance"] = max(0.0, u["balance"] + trade["cash"])
+            executed += 1
+
+    return {
+        "seed": seed,
+        "final_price": price_path[-1] if price_path else 0.0,
+        "price_path": price_path,
+        "conversion_payouts": payouts,
+        "trades_executed": executed,
+        "trades_skipped": skipped,
+        "wealth": wealth_summary(data),
+    }
+
+def section_sizes(snapshot: bytes) -> dict[str, Any]:
+    """Serialized size of each top-level section of a shard, plus the average per user."""
+    data = load_snapshot(snapshot)
+    sections = {key: len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)) for key, value in data.items()}
+    users = data.get("users", {})
+    return {
+        "total": len(snapshot),
+        "sections": dict(sorted(sections.items(), key=lambda kv: kv[1], reverse=True)),
+        "users": len(users),
+        "per_user": round(sections.get("users", 0) / len(users)) if users else 0,
+    }
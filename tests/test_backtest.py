@@ -0,0 +1,30 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import backtest  # noqa: E402
+
+def test_fill_defaults_matches_the_bot_loader():
+    data = backtest.fill_defaults({})
+    assert data == {"coins": {"Campton Coin": {"price": backtest.INITIAL_PRICE}}, "users": {}, "trade_history": []}
+    kept = backtest.fill_defaults({"coins": {"Campton Coin": {"price": 99.0}}, "users": {"1": {"balance": 5.0, "portfolio": {}}}})
+    assert kept["coins"]["Campton Coin"]["price"] == 99.0 and "1" in kept["users"]
+
+def test_replays_an_empty_data_file(tmp_path):
+    snapshot = tmp_path / "stock_market_data.json"
+    snapshot.write_text("{}")
+    report_path = tmp_path / "report.json"
+    assert backtest.main([str(snapshot), "--runs", "2", "--workers", "1", "--days", "14", "--output", str(report_path)]) == 0
+    report = json.loads(report_path.read_text())
+    baseline = report["scenarios"]["baseline"]
+    assert baseline["runs"] == 2
+    assert baseline["conversions_per_run"] == 2
+
+def test_rejects_a_file_that_is_not_market_data(tmp_path):
+    snapshot = tmp_path / "list.json"
+    snapshot.write_text("[]")
+    with pytest.raises(SystemExit):
+        backtest.main([str(snapshot), "--runs", "1", "--workers", "1"])
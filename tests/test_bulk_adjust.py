@@ -0,0 +1,70 @@
+import os
+import sys
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("discord")
+
+os.environ.setdefault("DISCORD_BOT_TOKEN", "test-token")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import bot as core  # noqa: E402
+from extensions import admin  # noqa: E402
+
+ALICE, BOB = 111111111111111111, 222222222222222222
+
+def make_shard() -> core.MarketShard:
+    data = core.default_market_data()
+    data["users"] = {
+        str(ALICE): {"balance": 50.0, "portfolio": {core.CAMPTOM_COIN_NAME: 2.0}},
+        str(BOB): {"balance": 0.0, "portfolio": {}},
+    }
+    return core.MarketShard(1, data)
+
+def test_parse_member_ids_accepts_mentions_and_bare_ids():
+    ids, errors = admin.parse_member_ids(f"<@{ALICE}>, <@!{BOB}> {ALICE}")
+    assert ids == [ALICE, BOB, ALICE]
+    assert errors == []
+
+@pytest.mark.parametrize("token", [f"<@&{ALICE}>", f"<#{ALICE}>", f"<:emoji:{ALICE}>", "12345", f"x{ALICE}"])
+def test_parse_member_ids_rejects_other_tokens(token):
+    ids, errors = admin.parse_member_ids(f"<@{BOB}> {token}")
+    assert ids == [BOB]
+    assert len(errors) == 1 and token in errors[0]
+
+def test_plan_sums_entries_for_the_same_user():
+    changes, errors = admin.plan_bulk_adjustment(make_shard(), "add_funds", [(ALICE, "1.50"), (ALICE, "2"), (BOB, None)], 5)
+    assert errors == []
+    assert changes == {ALICE: Decimal("3.50"), BOB: Decimal("5")}
+
+@pytest.mark.parametrize("raw", ["abc", "NaN", "Infinity", "-1", "0", "1.005"])
+def test_plan_rejects_bad_amounts(raw):
+    changes, errors = admin.plan_bulk_adjustment(make_shard(), "add_funds", [(ALICE, raw)], None)
+    assert len(errors) == 1 and str(ALICE) in errors[0]
+
+def test_plan_requires_an_amount():
+    _, errors = admin.plan_bulk_adjustment(make_shard(), "add_coins", [(ALICE, None)], None)
+    assert errors == [f"{ALICE}: no amount given."]
+
+def test_plan_refuses_removals_beyond_holdings():
+    shard = make_shard()
+    _, errors = admin.plan_bulk_adjustment(shard, "remove_funds", [(ALICE, "50"), (BOB, "0.01")], None)
+    assert len(errors) == 1 and errors[0].startswith(str(BOB))
+    _, errors = admin.plan_bulk_adjustment(shard, "remove_coins", [(ALICE, "1.5"), (ALICE, "1")], None)
+    assert len(errors) == 1 and errors[0].startswith(str(ALICE))
+
+def test_plan_does_not_touch_the_ledger():
+    shard = make_shard()
+    before = repr(shard.data["users"])
+    admin.plan_bulk_adjustment(shard, "remove_funds", [(ALICE, "10"), (999999999999999999, "1")], None)
+    assert repr(shard.data["users"]) == before
+
+def test_apply_changes_balances_and_holdings():
+    shard = make_shard()
+    changes, _ = admin.plan_bulk_adjustment(shard, "remove_coins", [(ALICE, "2")], None)
+    admin.apply_bulk_adjustment(shard, "remove_coins", changes)
+    assert core.CAMPTOM_COIN_NAME not in shard.data["users"][str(ALICE)]["portfolio"]
+    changes, _ = admin.plan_bulk_adjustment(shard, "add_funds", [(BOB, "12.34")], None)
+    admin.apply_bulk_adjustment(shard, "add_funds", changes)
+    assert shard.data["users"][str(BOB)]["balance"] == pytest.approx(12.34)
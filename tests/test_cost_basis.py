@@ -0,0 +1,61 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("discord")
+
+os.environ.setdefault("DISCORD_BOT_TOKEN", "test-token")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import bot as core  # noqa: E402
+
+COIN = "Campton Coin"
+
+def new_user(held: float = 0.0) -> dict:
+    return {"balance": 0.0, "portfolio": {COIN: held} if held else {}}
+
+# Same order as buy_coin_logic / sell_coin_logic: record first, then change the portfolio.
+def buy(user: dict, qty: float, price: float):
+    core.record_acquisition(user, COIN, qty, qty * price, price)
+    user["portfolio"][COIN] = user["portfolio"].get(COIN, 0.0) + qty
+
+def sell(user: dict, qty: float, price: float) -> float:
+    realized = core.record_disposal(user, COIN, qty, qty * price, price)
+    user["portfolio"][COIN] -= qty
+    if user["portfolio"][COIN] <= 0.0001:
+        del user["portfolio"][COIN]
+    return realized
+
+def test_buys_average_the_cost():
+    user = new_user()
+    buy(user, 1, 100.0)
+    buy(user, 1, 200.0)
+    assert user["cost_basis"][COIN] == [2, 300.0]
+
+def test_partial_sell_realizes_against_the_average():
+    user = new_user()
+    buy(user, 1, 100.0)
+    buy(user, 1, 200.0)
+    assert sell(user, 1, 250.0) == pytest.approx(100.0)
+    assert user["cost_basis"][COIN] == pytest.approx([1, 150.0])
+    assert user["realized_pnl"] == pytest.approx(100.0)
+
+def test_selling_everything_clears_the_basis_and_accumulates_pnl():
+    user = new_user()
+    buy(user, 2, 100.0)
+    sell(user, 1, 90.0)
+    sell(user, 1, 130.0)
+    assert COIN not in user["cost_basis"]
+    assert user["realized_pnl"] == pytest.approx(-10.0 + 30.0)
+
+def test_untracked_holdings_enter_at_the_current_price():
+    user = new_user(held=2.0)  # e.g. granted by an admin before cost basis existed
+    buy(user, 1, 100.0)
+    assert user["cost_basis"][COIN] == pytest.approx([3.0, 2 * 100.0 + 100.0])
+
+def test_position_cost_reconciles_with_the_portfolio():
+    assert core.position_cost(2.0, None, 50.0) == pytest.approx(100.0)
+    assert core.position_cost(4.0, (2.0, 300.0), 50.0) == pytest.approx(400.0)  # extra units at the current price
+    assert core.position_cost(1.0, (2.0, 300.0), 50.0) == pytest.approx(150.0)  # removed units leave pro rata
+    assert core.position_cost(0.0, (0.0, 0.0), 50.0) == 0.0
@@ -0,0 +1,42 @@
+import gzip
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import market_jobs  # noqa: E402
+
+MAX_BYTES = 1024 * 1024
+HEADER = b"user_id,balance\n"
+
+def lines(count: int, seed: int = 0) -> list[bytes]:
+    rng = random.Random(seed)
+    return [f"{i},{rng.randbytes(48).hex()}\n".encode() for i in range(count)]
+
+@pytest.mark.parametrize("count", [1, 1000, 40_000])
+def test_parts_fit_and_reassemble_in_order(count):
+    rows = lines(count)
+    parts = list(market_jobs.gzip_parts(iter(rows), MAX_BYTES, header=HEADER))
+    assert parts
+    assert all(len(part) <= MAX_BYTES for part in parts)
+    decoded = [gzip.decompress(part) for part in parts]  # every part is a standalone gzip file
+    assert all(text.startswith(HEADER) for text in decoded)
+    assert b"".join(text[len(HEADER):] for text in decoded) == b"".join(rows)
+
+def test_large_exports_are_split():
+    rows = lines(40_000)  # ~4 MB of incompressible text
+    parts = list(market_jobs.gzip_parts(iter(rows), MAX_BYTES, header=HEADER))
+    assert len(parts) >= 3
+    assert all(len(part) >= MAX_BYTES - market_jobs.GZIP_SIZE_MARGIN for part in parts[:-1])
+
+def test_no_rows_means_no_parts():
+    assert list(market_jobs.gzip_parts(iter([]), MAX_BYTES, header=HEADER)) == []
+
+def test_encode_rows_csv_and_ndjson():
+    rows = [{"user_id": 1, "balance": 2.5, "extra": "ignored"}]
+    columns = ["user_id", "balance"]
+    assert market_jobs.csv_header(columns) == b"user_id,balance\r\n"
+    assert list(market_jobs.encode_rows(rows, "csv", columns)) == [b"1,2.5\r\n"]
+    assert list(market_jobs.encode_rows(rows, "ndjson", columns)) == [b'{"user_id": 1, "balance": 2.5, "extra": "ignored"}\n']
@@ -0,0 +1,46 @@
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("discord")
+from discord.ext import commands
+
+os.environ.setdefault("DISCORD_BOT_TOKEN", "test-token")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import bot as core  # noqa: E402
+
+PROBE = '''
+from discord import app_commands
+from bot import register_commands
+
+@app_commands.command(name="reloadprobe", description="Reload probe.")
+async def reloadprobe(interaction):
+    pass
+
+async def setup(bot):
+    register_commands(bot, globals())
+'''
+
+def test_broken_reload_keeps_previous_commands(tmp_path, monkeypatch):
+    probe = tmp_path / "reload_probe.py"
+    probe.write_text(PROBE)
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    async def scenario():
+        await core.bot.load_extension("reload_probe")
+        before = len(core.bot.tree.get_commands())
+        assert core.bot.tree.get_command("reloadprobe") is not None
+
+        probe.write_text(PROBE + "\nraise RuntimeError('broken deploy')\n")
+        with pytest.raises(commands.ExtensionFailed):
+            await core.bot.reload_extension("reload_probe")
+
+        assert "reload_probe" in core.bot.extensions
+        assert core.bot.tree.get_command("reloadprobe") is not None
+        assert len(core.bot.tree.get_commands()) == before
+        await core.bot.unload_extension("reload_probe")
+
+    asyncio.run(scenario())
@@ -0,0 +1,72 @@
+import asyncio
+import datetime
+import os
+import sys
+from datetime import timedelta
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("discord")
+
+os.environ.setdefault("DISCORD_BOT_TOKEN", "test-token")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import bot as core  # noqa: E402
+
+INTERVAL = timedelta(hours=1)
+
+@pytest.fixture(autouse=True)
+def no_save(monkeypatch):
+    async def save_data(shard):
+        pass
+    monkeypatch.setattr(core, "save_data", save_data)
+
+def fire(job: core.ScheduledJob, due: datetime.datetime) -> tuple[core.MarketShard, int]:
+    """Run one scheduler firing of job for a fresh shard; returns the shard and how often the handler ran."""
+    shard = core.MarketShard(1, core.default_market_data())
+    job.set_due(shard, due)
+    runs = []
+
+    async def handler(s):
+        runs.append(s)
+    job.handler = handler
+    asyncio.run(core.MarketScheduler()._fire(shard, job, due))
+    return shard, len(runs)
+
+def ago(intervals: float) -> datetime.datetime:
+    return core.discord.utils.utcnow() - intervals * INTERVAL
+
+@pytest.mark.parametrize("catch_up, late, expected_runs", [
+    (core.CATCH_UP_RUN_ONCE, 0.01, 1),
+    (core.CATCH_UP_RUN_ONCE, 3.5, 1),
+    (core.CATCH_UP_RUN_ALL, 0.01, 1),
+    (core.CATCH_UP_RUN_ALL, 3.5, 4),
+    (core.CATCH_UP_RUN_ALL, 50.5, core.MAX_CATCH_UP_RUNS),
+    (core.CATCH_UP_SKIP, 0.01, 1),
+    (core.CATCH_UP_SKIP, 3.5, 0),
+])
+def test_catch_up_runs(catch_up, late, expected_runs):
+    job = core.ScheduledJob("test", INTERVAL, catch_up, None, grace=timedelta(minutes=5))
+    _, runs = fire(job, ago(late))
+    assert runs == expected_runs
+
+@pytest.mark.parametrize("late", [0.01, 0.99, 3.5])
+def test_next_due_stays_on_the_original_cadence(late):
+    due = ago(late)
+    job = core.ScheduledJob("test", INTERVAL, core.CATCH_UP_RUN_ONCE, None)
+    shard, _ = fire(job, due)
+    next_due = job.due(shard)
+    assert next_due > core.discord.utils.utcnow()
+    assert next_due - INTERVAL <= core.discord.utils.utcnow()
+    assert (next_due - due) % INTERVAL == timedelta(0)
+
+def test_a_scheduled_conversion_keeps_the_anchored_due_time(monkeypatch):
+    monkeypatch.setattr(core.MarketShard, "guild", property(lambda shard: object()))  # no holders to convert
+    job = core.SCHEDULED_JOBS["conversion"]
+    due = core.discord.utils.utcnow() - timedelta(minutes=1)
+    shard = core.MarketShard(1, core.default_market_data())
+    job.set_due(shard, due)
+    scheduler = core.MarketScheduler()
+    asyncio.run(scheduler._fire(shard, job, due))
+    assert job.due(shard) == due + job.interval
+    assert [entry for entry in scheduler._heap if entry[2] == "conversion"] == [((due + job.interval).timestamp(), 1, "conversion")]
@@ -0,0 +1,75 @@
+import json
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("discord")
+
+os.environ.setdefault("DISCORD_BOT_TOKEN", "test-token")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import bot as core  # noqa: E402
+
+def save(store: core.SnapshotStore, data: dict, commit: bool = True) -> dict:
+    entry = store.write(json.dumps(data).encode())
+    assert entry is not None
+    if commit:
+        assert store.commit(entry, backup_message_id=entry["seq"] * 10)
+    return entry
+
+def reopen(store: core.SnapshotStore) -> core.SnapshotStore:
+    return core.SnapshotStore(store.directory)
+
+def test_load_returns_the_newest_generation(tmp_path):
+    store = core.SnapshotStore(tmp_path)
+    for n in range(3):
+        save(store, {"n": n})
+    fresh = reopen(store)
+    assert fresh.load() == {"n": 2}
+    assert fresh.current["seq"] == 3 and fresh.current["backup_message_id"] == 30
+
+def test_checksum_mismatch_falls_back_and_quarantines(tmp_path):
+    store = core.SnapshotStore(tmp_path)
+    save(store, {"n": 1})
+    latest = save(store, {"n": 2})
+    (tmp_path / latest["file"]).write_text(json.dumps({"n": "tampered"}))
+
+    fresh = reopen(store)
+    assert fresh.load() == {"n": 1}
+    assert fresh.current["seq"] == 1
+    assert not (tmp_path / latest["file"]).exists()
+    assert list(tmp_path.glob(f"{latest['file']}.corrupt-*"))
+
+def test_unreadable_manifest_falls_back_to_scanning(tmp_path):
+    store = core.SnapshotStore(tmp_path)
+    save(store, {"n": 1})
+    save(store, {"n": 2})
+    store.manifest_path.write_text("{not json")
+    assert reopen(store).load() == {"n": 2}
+
+def test_missing_manifest_falls_back_to_scanning(tmp_path):
+    store = core.SnapshotStore(tmp_path)
+    save(store, {"n": 1})
+    store.manifest_path.unlink()
+    assert reopen(store).load() == {"n": 1}
+
+def test_uncommitted_generation_is_still_the_newest_save(tmp_path):
+    store = core.SnapshotStore(tmp_path)
+    save(store, {"n": 1})
+    save(store, {"n": 2}, commit=False)  # crashed while the backup was uploading
+    fresh = reopen(store)
+    assert fresh.load() == {"n": 2}
+    assert fresh.current["seq"] == 2
+
+def test_old_generations_are_pruned(tmp_path):
+    store = core.SnapshotStore(tmp_path)
+    for n in range(core.SNAPSHOT_GENERATIONS + 3):
+        save(store, {"n": n})
+    assert len(list(tmp_path.glob("gen_*.json"))) == core.SNAPSHOT_GENERATIONS
+    assert [e["seq"] for e in store.generations] == list(range(core.SNAPSHOT_GENERATIONS + 3, 3, -1))
+
+def test_empty_directory_loads_nothing(tmp_path):
+    store = core.SnapshotStore(tmp_path / "missing")
+    assert store.load() is None
+    assert store.current is None
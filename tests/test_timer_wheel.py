@@ -0,0 +1,82 @@
+import asyncio
+import datetime
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("discord")
+
+os.environ.setdefault("DISCORD_BOT_TOKEN", "test-token")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import bot as core  # noqa: E402
+
+NOW = 1_700_000_000
+
+@pytest.mark.parametrize("delay", [0, 1, 63, 64, 65, 4095, 4096, 300_000, 2**24 + 5])
+def test_item_fires_exactly_at_its_tick(delay):
+    wheel = core.TimerWheel(NOW)
+    wheel.insert(NOW + delay, "item")
+    if delay:
+        assert wheel.advance(NOW + delay - 1) == []
+    assert wheel.advance(NOW + delay) == ["item"]
+    assert len(wheel) == 0
+
+def test_past_items_fire_on_the_next_advance():
+    wheel = core.TimerWheel(NOW)
+    wheel.advance(NOW + 10)
+    wheel.insert(NOW, "late")
+    assert wheel.advance(NOW + 11) == ["late"]
+
+def test_items_come_out_in_tick_order_across_levels():
+    wheel = core.TimerWheel(NOW)
+    delays = [5000, 3, 70, 3, 200_000]
+    for i, delay in enumerate(delays):
+        wheel.insert(NOW + delay, (delay, i))
+    fired = []
+    while len(wheel):
+        fired += wheel.advance(wheel.next_deadline())
+    assert [delay for delay, _ in fired] == sorted(delays)
+
+def test_next_deadline_never_passes_a_due_item():
+    wheel = core.TimerWheel(NOW)
+    assert wheel.next_deadline() is None
+    wheel.insert(NOW + 100, "item")
+    deadline = wheel.next_deadline()
+    assert deadline <= NOW + 100
+    # Following the deadlines reaches the item without skipping it.
+    while not (fired := wheel.advance(deadline)):
+        deadline = wheel.next_deadline()
+        assert deadline <= NOW + 100
+    assert fired == ["item"] and deadline == NOW + 100
+
+def make_shard(guild_id: int, due: datetime.datetime, repeat_seconds: int | None = None) -> core.MarketShard:
+    data = core.default_market_data()
+    data["announcements"] = {"1": {"channel_id": 1, "message": "hi", "due": due.isoformat(),
+                                   "repeat_seconds": repeat_seconds, "created_by": 1}}
+    return core.MarketShard(guild_id, data)
+
+def test_adding_the_same_announcement_twice_queues_it_once():
+    dispatcher = core.AnnouncementDispatcher()
+    shard = make_shard(1, datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(hours=1))
+    dispatcher.add(shard, "1")
+    dispatcher.add_shard(shard)
+    assert len(dispatcher.wheel) == 1
+
+def test_dispatch_requeues_only_the_occurrence_that_fired(monkeypatch):
+    async def no_save(shard):
+        pass
+    monkeypatch.setattr(core, "save_data", no_save)
+
+    dispatcher = core.AnnouncementDispatcher()
+    due = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0) - datetime.timedelta(seconds=5)
+    shard = make_shard(1, due, repeat_seconds=3600)
+    due_tick = int(due.timestamp())
+    # The fired item plus a stale one left over from before the announcement was rescheduled.
+    asyncio.run(dispatcher._dispatch(shard, [("1", due_tick), ("1", due_tick - 600)]))
+
+    next_tick = int(datetime.datetime.fromisoformat(shard.data["announcements"]["1"]["due"]).timestamp())
+    assert next_tick == due_tick + 3600
+    assert dispatcher.queued == {(1, "1", next_tick)}
+    assert len(dispatcher.wheel) == 1
@@ -0,0 +1,56 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("discord")
+
+os.environ.setdefault("DISCORD_BOT_TOKEN", "test-token")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import bot as core  # noqa: E402
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(core.time, "monotonic", clock)
+    return clock
+
+def test_burst_up_to_capacity_then_reject(clock):
+    bucket = core.TokenBucket(3, 30.0)
+    assert [bucket.try_acquire() for _ in range(4)] == [True, True, True, False]
+
+def test_retry_after_is_time_to_the_next_token(clock):
+    bucket = core.TokenBucket(3, 30.0)  # one token every 10 seconds
+    assert bucket.retry_after() == 0.0
+    for _ in range(3):
+        bucket.try_acquire()
+    assert bucket.retry_after() == pytest.approx(10.0)
+    clock.now += 4
+    assert bucket.retry_after() == pytest.approx(6.0)
+    assert not bucket.try_acquire()
+    clock.now += 6
+    assert bucket.retry_after() == 0.0
+    assert bucket.try_acquire()
+
+def test_rejected_attempts_do_not_cost_tokens(clock):
+    bucket = core.TokenBucket(1, 10.0)
+    assert bucket.try_acquire()
+    for _ in range(5):
+        clock.now += 1
+        assert not bucket.try_acquire()
+    clock.now += 5
+    assert bucket.try_acquire()
+
+def test_refill_is_capped_at_capacity(clock):
+    bucket = core.TokenBucket(2, 10.0)
+    bucket.try_acquire()
+    clock.now += 3600
+    assert [bucket.try_acquire() for _ in range(3)] == [True, True, False]
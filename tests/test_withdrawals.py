@@ -0,0 +1,78 @@
+import os
+import sys
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("discord")
+
+os.environ.setdefault("DISCORD_BOT_TOKEN", "test-token")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import bot as core  # noqa: E402
+
+ALICE, BOB, OWNER = 111, 222, 999
+
+def make_shard() -> core.MarketShard:
+    data = core.default_market_data()
+    data["users"] = {str(ALICE): {"balance": 100.0, "portfolio": {}}, str(BOB): {"balance": 40.0, "portfolio": {}}}
+    return core.MarketShard(1, data)
+
+def user(shard: core.MarketShard, uid: int) -> dict:
+    return shard.data["users"][str(uid)]
+
+def test_submit_moves_the_amount_on_hold():
+    shard = make_shard()
+    request = shard.withdrawals.submit(ALICE, "Alice", Decimal("30"))
+    assert user(shard, ALICE)["balance"] == pytest.approx(70.0)
+    assert user(shard, ALICE)["withdrawal_hold"] == pytest.approx(30.0)
+    assert shard.withdrawals.pending() == [request]
+    assert shard.view.user(ALICE).withdrawal_hold == pytest.approx(30.0)
+
+def test_approve_pays_out_the_hold_and_deny_returns_it():
+    shard = make_shard()
+    queue = shard.withdrawals
+    first = queue.submit(ALICE, "Alice", Decimal("30"))
+    second = queue.submit(ALICE, "Alice", Decimal("20"))
+    assert queue.settle([first["id"]], approve=True, settled_by=OWNER) == [first]
+    assert queue.settle([second["id"]], approve=False, settled_by=OWNER) == [second]
+    assert user(shard, ALICE)["balance"] == pytest.approx(70.0)
+    assert user(shard, ALICE)["withdrawal_hold"] == pytest.approx(0.0)
+    assert [r["status"] for r in queue.for_user(ALICE)] == ["approved", "denied"]
+    assert queue.pending() == []
+
+def test_settling_twice_is_a_no_op():
+    shard = make_shard()
+    queue = shard.withdrawals
+    request = queue.submit(BOB, "Bob", Decimal("40"))
+    assert queue.settle([request["id"]], approve=False, settled_by=OWNER) == [request]
+    # A second reviewer acting on a stale page.
+    assert queue.settle([request["id"]], approve=False, settled_by=OWNER) == []
+    assert queue.settle([request["id"]], approve=True, settled_by=OWNER) == []
+    assert user(shard, BOB)["balance"] == pytest.approx(40.0)
+    assert request["status"] == "denied"
+
+def test_duplicate_ids_in_one_batch_settle_once():
+    shard = make_shard()
+    queue = shard.withdrawals
+    request = queue.submit(BOB, "Bob", Decimal("10"))
+    assert queue.settle([request["id"], request["id"], 12345], approve=False, settled_by=OWNER) == [request]
+    assert user(shard, BOB)["balance"] == pytest.approx(40.0)
+
+def test_rebuild_matches_the_incremental_index():
+    shard = make_shard()
+    queue = shard.withdrawals
+    requests = [queue.submit(ALICE, "Alice", Decimal("5")) for _ in range(3)]
+    queue.settle([requests[1]["id"]], approve=True, settled_by=OWNER)
+    rebuilt = core.WithdrawalQueue(shard)
+    assert rebuilt.by_status == queue.by_status
+    assert rebuilt.by_user == queue.by_user
+
+def test_only_the_newest_settled_requests_are_kept(monkeypatch):
+    monkeypatch.setattr(core, "SETTLED_WITHDRAWALS_KEPT", 2)
+    shard = make_shard()
+    queue = shard.withdrawals
+    requests = [queue.submit(ALICE, "Alice", Decimal("1")) for _ in range(4)]
+    queue.settle([r["id"] for r in requests[:3]], approve=True, settled_by=OWNER)
+    assert [r["id"] for r in queue.for_user(ALICE)] == [r["id"] for r in requests[1:]]
+    assert queue.pending() == [requests[3]]